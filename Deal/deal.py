@@ -77,3 +77,45 @@ class Future(Deal):
     maturity: datetime
 
     
+
+@dataclass
+class Asian(Deal):
+    """
+    Represents an arithmetic average-rate option: the payoff compares the
+    arithmetic average of the daily fixings of the underlying, from the
+    start date to the maturity, with the strike (option_type: Call or Put).
+    """
+    deal_id: str
+    position: str
+    notional: float
+    currency: str
+    underlying: str
+    rate_const: float
+    vol_const: float
+    strike: float
+    start_date: datetime
+    maturity: datetime
+    option_type: str
+
+
+@dataclass
+class Barrier(Deal):
+    """
+    Represents a knock-in / knock-out barrier option: a Call or Put that
+    is activated (in) or cancelled (out) as soon as the underlying crosses
+    the barrier level between the start date and the maturity
+    (barrier_type: up-and-in, up-and-out, down-and-in or down-and-out).
+    """
+    deal_id: str
+    position: str
+    notional: float
+    currency: str
+    underlying: str
+    rate_const: float
+    vol_const: float
+    strike: float
+    start_date: datetime
+    maturity: datetime
+    option_type: str
+    barrier: float
+    barrier_type: str
@@ -0,0 +1,192 @@
+"""
+@author: babacardiallo
+"""
+import os
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, fields
+
+import numpy as np
+
+from Deal.deal import Call, Put, Future, Asian, Barrier
+from preprocessing import DealPreprocessing
+
+# Types de transaction du book columnar -> classe Deal correspondante
+DEAL_TYPES = {"Call": Call, "Put": Put, "Future": Future, "Asian": Asian, "Barrier": Barrier}
+
+# Version du format du cache : toute évolution des colonnes invalide les caches existants
+BOOK_FORMAT = 2
+
+
+def _parse_deal_file(path: str) -> tuple:
+    """
+    Lit un fichier XML de transaction et retourne sa ligne du book (tuple de champs).
+    Fonction de module pour être exécutable dans un processus du pool.
+    """
+    deal = DealPreprocessing(ET.parse(path).getroot()).build()
+    return DealBook.row(deal)
+
+
+@dataclass
+class DealBook:
+    """
+    Book de transactions au format columnar : un tableau numpy par champ, une ligne
+    par transaction. Les champs absents d'un type (vol et strike d'un Future, barrière
+    d'une option vanille) valent NaN, ou une chaîne vide pour les champs texte.
+
+    Paramètres :
+    ------------
+    - deal_id, deal_type, position, currency, underlying : np.ndarray (str)
+    - notional, rate, vol, strike : np.ndarray (float64)
+    - start_date, maturity : np.ndarray (datetime64[D])
+    - option_type, barrier_type : np.ndarray (str) -> Call / Put et type de barrière des exotiques
+    - barrier : np.ndarray (float64) -> Niveau de barrière
+    - source : np.ndarray (str) -> Fichier XML d'origine de chaque ligne
+    """
+    deal_id: np.ndarray
+    deal_type: np.ndarray
+    position: np.ndarray
+    notional: np.ndarray
+    currency: np.ndarray
+    underlying: np.ndarray
+    rate: np.ndarray
+    vol: np.ndarray
+    strike: np.ndarray
+    start_date: np.ndarray
+    maturity: np.ndarray
+    option_type: np.ndarray
+    barrier: np.ndarray
+    barrier_type: np.ndarray
+    source: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.deal_id)
+
+    @staticmethod
+    def row(deal, source: str = "") -> tuple:
+        return (deal.deal_id, deal.get_class_name(), deal.position, float(deal.notional), deal.currency,
+                deal.underlying, float(deal.rate_const), float(getattr(deal, "vol_const", np.nan)),
+                float(getattr(deal, "strike", np.nan)), np.datetime64(deal.start_date, "D"),
+                np.datetime64(deal.maturity, "D"), getattr(deal, "option_type", ""),
+                float(getattr(deal, "barrier", np.nan)), getattr(deal, "barrier_type", ""), source)
+
+    @classmethod
+    def from_rows(cls, rows: list) -> "DealBook":
+        columns = list(zip(*rows)) if rows else [()] * len(fields(cls))
+        dtypes = {"notional": float, "rate": float, "vol": float, "strike": float, "barrier": float,
+                  "start_date": "datetime64[D]", "maturity": "datetime64[D]"}
+        return cls(**{field.name: np.array(column, dtype=dtypes.get(field.name, str))
+                      for field, column in zip(fields(cls), columns)})
+
+    @classmethod
+    def from_deals(cls, deals: dict) -> "DealBook":
+        return cls.from_rows([cls.row(deal) for deal in deals.values()])
+
+    def take(self, index) -> "DealBook":
+        """
+        Sous-book (masque booléen ou indices), ex. book.take(book.underlying == 'CAC40').
+        """
+        return DealBook(**{field.name: getattr(self, field.name)[index] for field in fields(self)})
+
+    def to_deals(self) -> dict:
+        """
+        Reconstruit les objets Deal ({deal_id: Deal}) attendus par l'évaluateur.
+        """
+        deals = {}
+        start_dates = self.start_date.astype("datetime64[s]").astype(object)
+        maturities = self.maturity.astype("datetime64[s]").astype(object)
+        for i in range(len(self)):
+            common = dict(deal_id=str(self.deal_id[i]), position=str(self.position[i]),
+                          notional=float(self.notional[i]), currency=str(self.currency[i]),
+                          underlying=str(self.underlying[i]), rate_const=float(self.rate[i]),
+                          start_date=start_dates[i], maturity=maturities[i])
+            deal_class = DEAL_TYPES[self.deal_type[i]]
+            if deal_class is Future:
+                deals[common["deal_id"]] = Future(**common)
+                continue
+            common.update(vol_const=float(self.vol[i]), strike=float(self.strike[i]))
+            if deal_class is Asian:
+                common.update(option_type=str(self.option_type[i]))
+            elif deal_class is Barrier:
+                common.update(option_type=str(self.option_type[i]), barrier=float(self.barrier[i]),
+                              barrier_type=str(self.barrier_type[i]))
+            deals[common["deal_id"]] = deal_class(**common)
+        return deals
+
+    def save(self, path: str, manifest: dict):
+        """
+        Ecrit le book et le manifeste des fichiers sources ({fichier: (mtime_ns, taille)})
+        dans un .npz sans objets Python (chargement sans pickle), de façon atomique.
+        """
+        files = sorted(manifest)
+        stats = np.array([manifest[file] for file in files], dtype=np.int64).reshape(-1, 2)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, format=BOOK_FORMAT, manifest_files=np.array(files, dtype=str), manifest_stats=stats,
+                 **{field.name: getattr(self, field.name) for field in fields(self)})
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str):
+        """
+        Retourne (book, manifeste) depuis le cache, ou (None, {}) si absent ou d'un autre format.
+        """
+        if not os.path.exists(path):
+            return None, {}
+        with np.load(path, allow_pickle=False) as cached:
+            if int(cached["format"]) != BOOK_FORMAT:
+                return None, {}
+            manifest = {str(file): tuple(int(v) for v in stat)
+                        for file, stat in zip(cached["manifest_files"], cached["manifest_stats"])}
+            return cls(**{field.name: cached[field.name] for field in fields(cls)}), manifest
+
+
+def scan_deal_files(directory: str, suffix: str = ".xml") -> dict:
+    """
+    Liste les fichiers de transaction du répertoire : {nom du fichier: (mtime_ns, taille)}.
+    """
+    with os.scandir(directory) as entries:
+        return {entry.name: (entry.stat().st_mtime_ns, entry.stat().st_size)
+                for entry in entries if entry.is_file() and entry.name.lower().endswith(suffix)}
+
+
+def load_deal_book(directory: str, cache_path: str = None, n_workers: int = 1) -> DealBook:
+    """
+    Charge toutes les transactions XML d'un répertoire en un DealBook.
+
+    Avec `cache_path`, le book compilé est relu depuis le cache ; seuls les fichiers
+    nouveaux ou modifiés (mtime ou taille) sont re-parsés, les fichiers supprimés
+    sont retirés, et le cache n'est réécrit que si le répertoire a changé.
+    Le parsing est réparti sur `n_workers` processus.
+
+    Paramètres :
+    ------------
+    - directory : str -> Répertoire des fichiers XML
+    - cache_path : str -> Fichier .npz du book compilé (None : pas de cache)
+    - n_workers : int -> Nombre de processus de parsing
+    """
+    manifest = scan_deal_files(directory)
+    cached, cached_manifest = DealBook.load(cache_path) if cache_path else (None, {})
+    if cached is not None and cached_manifest == manifest:
+        return cached
+
+    kept = [] if cached is None else [i for i, source in enumerate(cached.source)
+                                      if cached_manifest.get(source) == manifest.get(source)]
+    kept_sources = set() if cached is None else set(cached.source[kept])
+    to_parse = sorted(file for file in manifest if file not in kept_sources)
+    paths = [os.path.join(directory, file) for file in to_parse]
+
+    if n_workers > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            parsed = list(executor.map(_parse_deal_file, paths, chunksize=max(1, len(paths) // (4 * n_workers))))
+    else:
+        parsed = [_parse_deal_file(path) for path in paths]
+
+    rows = [] if cached is None else list(zip(*(getattr(cached, field.name)[kept] for field in fields(DealBook))))
+    rows += [row[:-1] + (file,) for row, file in zip(parsed, to_parse)]
+    rows.sort(key=lambda row: row[-1])
+    book = DealBook.from_rows(rows)
+
+    if cache_path:
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+        book.save(cache_path, manifest)
+    return book
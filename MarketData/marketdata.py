@@ -1,38 +1,182 @@
 # -*- coding: utf-8 -*-
+import numpy as np
 import pandas as pd
-from dataclasses import dataclass
+from collections.abc import Mapping
+from dataclasses import dataclass, field
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
 @author: babacardiallo
 """
 @dataclass
-class Rate:
+class MarketSeries:
+    """
+    Série de marché (Date, Price). Les lookups par date s'appuient sur un index
+    trié construit une seule fois (dates en int64 ns + prix en float64) :
+    recherche exacte en O(1) via dictionnaire, as-of et bulk par recherche dichotomique.
+    Le DataFrame `data` est considéré en lecture seule après la première lecture.
+    """
     name: str
     data: pd.DataFrame
+    _dates: np.ndarray = field(default=None, init=False, repr=False, compare=False)
+    _prices: np.ndarray = field(default=None, init=False, repr=False, compare=False)
+    _positions: dict = field(default=None, init=False, repr=False, compare=False)
 
-    def get_by_date(self, date: str) -> pd.Series:
+    def _build_index(self):
         if "Date" not in self.data.columns:
             raise KeyError("La colonne 'Date' est absente du DataFrame.")
-        return self.data[self.data["Date"] == date].Price[0]
-       
-@dataclass    
-class Equity:
-    name: str
-    data: pd.DataFrame
+        dates = pd.to_datetime(self.data["Date"]).to_numpy(dtype="datetime64[ns]").view(np.int64)
+        prices = self.data["Price"].to_numpy(dtype=np.float64)
+        order = np.argsort(dates, kind="stable")
+        self._dates = np.ascontiguousarray(dates[order])
+        self._prices = np.ascontiguousarray(prices[order])
+
+    def _build_positions(self):
+        dates, _ = self.as_arrays()
+        self._positions = {}
+        for position, date in enumerate(dates.tolist()):
+            self._positions.setdefault(date, position)
+
+    @classmethod
+    def from_arrays(cls, name: str, dates: np.ndarray, prices: np.ndarray):
+        """
+        Construit la série à partir de tableaux déjà triés (dates int64 ns, prix float64),
+        ex. lus depuis MarketDataStore : l'index est repris tel quel, sans re-parsing des dates.
+        """
+        series = cls(name=name, data=pd.DataFrame({"Date": dates.view("datetime64[ns]"), "Price": prices}))
+        series._dates, series._prices = dates, prices
+        return series
+
+    @staticmethod
+    def _to_ns(dates) -> np.ndarray:
+        return pd.to_datetime(np.atleast_1d(dates)).to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+    def as_arrays(self):
+        """
+        Retourne (dates int64 ns triées, prix float64) de la série, sans copie.
+        """
+        if self._dates is None:
+            self._build_index()
+        return self._dates, self._prices
+
+    def get_by_date(self, date: str, asof: bool = False) -> float:
+        """
+        Prix à la date `date`. Avec `asof=True`, retourne le dernier prix
+        disponible à une date antérieure ou égale.
+        """
+        if self._positions is None:
+            self._build_positions()
+        key = pd.Timestamp(date).value
+        position = self._positions.get(key)
+        if position is None:
+            if not asof:
+                raise KeyError(f"Date {date} absente de la série {self.name}.")
+            position = np.searchsorted(self._dates, key, side="right") - 1
+            if position < 0:
+                raise KeyError(f"Aucune donnée antérieure à {date} pour la série {self.name}.")
+        return self._prices[position]
+
+    def get_by_dates(self, dates, asof: bool = False) -> np.ndarray:
+        """
+        Version vectorisée de `get_by_date` pour un vecteur de dates.
+        Retourne un np.ndarray de prix aligné sur `dates`.
+        """
+        if self._dates is None:
+            self._build_index()
+        keys = self._to_ns(dates)
+        if asof:
+            positions = np.searchsorted(self._dates, keys, side="right") - 1
+            if np.any(positions < 0):
+                raise KeyError(f"Dates antérieures au début de la série {self.name}.")
+        else:
+            positions = np.searchsorted(self._dates, keys, side="left")
+            found = positions < len(self._dates)
+            found[found] = self._dates[positions[found]] == keys[found]
+            if not np.all(found):
+                missing = pd.to_datetime(keys[~found]).strftime('%m/%d/%Y').tolist()
+                raise KeyError(f"Dates {missing} absentes de la série {self.name}.")
+        return self._prices[positions]
 
-    def get_by_date(self, date: str) -> pd.Series:
-        if "Date" not in self.data.columns:
-            raise KeyError("La colonne 'Date' est absente du DataFrame.")
-        return self.data[self.data["Date"] == date].Price[0]
 
 @dataclass
-class Commodity:
-    name: str
-    data: pd.DataFrame
+class Rate(MarketSeries):
+    pass
 
-    def get_by_date(self, date: str) -> pd.Series:
-        if "Date" not in self.data.columns:
-            raise KeyError("La colonne 'Date' est absente du DataFrame.")
-        return self.data[self.data["Date"] == date].Price[0]
-        
+
+@dataclass
+class Equity(MarketSeries):
+    pass
+
+
+@dataclass
+class Commodity(MarketSeries):
+    pass
+
+
+class ShockedSeries:
+    """
+    Vue en lecture seule sur une série de marché dont la valeur à une date
+    donnée est remplacée par un spot choqué (scalaire ou tableau de scénarios).
+    L'historique n'est jamais copié : les autres dates sont lues sur la série d'origine.
+    """
+
+    def __init__(self, base, date, spot):
+        self.base = base
+        self.date = pd.Timestamp(date)
+        self.spot = spot
+
+    @property
+    def name(self) -> str:
+        return self.base.name
+
+    @property
+    def data(self) -> pd.DataFrame:
+        return self.base.data
+
+    def get_by_date(self, date: str, asof: bool = False):
+        if pd.Timestamp(date) == self.date:
+            return self.spot
+        return self.base.get_by_date(date, asof=asof)
+
+    def get_by_dates(self, dates, asof: bool = False):
+        return self.base.get_by_dates(dates, asof=asof)
+
+    def as_arrays(self):
+        return self.base.as_arrays()
+
+
+class MarketScenario(Mapping):
+    """
+    Etat de marché d'un scénario : les données historiques sont partagées
+    avec `market_data` et seuls les facteurs présents dans `spots` sont
+    surchargés à la date `date`. Aucun DataFrame n'est alloué par scénario ;
+    un tableau de spots permet de représenter tous les scénarios à la fois.
+
+    Paramètres :
+    ------------
+    - market_data : dict -> {nom: Equity | Rate | Commodity}
+    - date : str | pd.Timestamp -> Date à laquelle les spots sont choqués
+    - spots : dict -> {nom: spot choqué (float ou np.ndarray)}
+    - path_statistics : dict -> {PathStatistic: np.ndarray} statistiques des trajectoires
+      simulées depuis `origin` (produits path-dependent)
+    - origin : str | pd.Timestamp -> Date de départ des trajectoires (None : pas de trajectoire,
+      l'historique est réputé connu jusqu'à `date`)
+    """
+
+    def __init__(self, market_data: dict, date, spots: dict, path_statistics: dict = None, origin=None):
+        self.market_data = market_data
+        self.date = pd.Timestamp(date)
+        self.spots = spots
+        self.path_statistics = path_statistics or {}
+        self.origin = None if origin is None else pd.Timestamp(origin)
+
+    def __getitem__(self, name: str):
+        if name in self.spots:
+            return ShockedSeries(self.market_data[name], self.date, self.spots[name])
+        return self.market_data[name]
+
+    def __iter__(self):
+        return iter(self.market_data)
+
+    def __len__(self) -> int:
+        return len(self.market_data)
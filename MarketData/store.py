@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+@author: babacardiallo
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from MarketData.marketdata import Equity, Rate, Commodity
+from preprocessing import MARKET_DATA_TYPES, MarketDataPreprocessing
+
+# Version du format du store : toute évolution invalide les stores existants
+STORE_FORMAT = 1
+
+SERIES_TYPES = {series_type.__name__: series_type for series_type in (Equity, Rate, Commodity)}
+
+
+def file_digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class MarketDataStore:
+    """
+    Store binaire des séries de marché : chaque CSV n'est parsé qu'une fois, puis
+    toutes les séries sont consolidées dans deux fichiers .npy (dates int64 ns triées
+    et prix float64, concaténés) décrits par un index JSON (offset, longueur, type,
+    source, mtime, taille et sha256 du CSV).
+
+    Une série n'est re-parsée que si son CSV a changé : mtime et taille identiques ->
+    aucune lecture du CSV ; sinon le sha256 est recalculé et seul un contenu différent
+    déclenche le parsing. Le chargement d'un univers est une lecture memory-mappée
+    des deux tableaux, chaque série étant une vue sur sa tranche.
+
+    Paramètres :
+    ------------
+    - store_dir : str -> Répertoire du store (index.json, dates.<génération>.npy, prices.<génération>.npy)
+    """
+
+    def __init__(self, store_dir: str):
+        self.store_dir = store_dir
+        os.makedirs(store_dir, exist_ok=True)
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.store_dir, "index.json")
+
+    def _array_path(self, kind: str, generation: int) -> str:
+        return os.path.join(self.store_dir, f"{kind}.{generation}.npy")
+
+    def read_index(self) -> dict:
+        if not os.path.exists(self.index_path):
+            return {"format": STORE_FORMAT, "generation": 0, "series": {}}
+        with open(self.index_path) as f:
+            index = json.load(f)
+        if index.get("format") != STORE_FORMAT:
+            return {"format": STORE_FORMAT, "generation": index.get("generation", 0), "series": {}}
+        return index
+
+    def _write_index(self, index: dict):
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self.index_path)
+
+    def _arrays(self, index: dict):
+        if not index["series"]:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        generation = index["generation"]
+        return (np.load(self._array_path("dates", generation), mmap_mode="r"),
+                np.load(self._array_path("prices", generation), mmap_mode="r"))
+
+    def sync(self, sources: dict, types: dict = None) -> list:
+        """
+        Met le store en phase avec `sources` ({nom: chemin du CSV}) et retourne la liste
+        des séries (re)parsées. Le type de chaque série est lu dans `types` ({nom: classe})
+        ou, à défaut, dans preprocessing.MARKET_DATA_TYPES.
+        """
+        types = {**MARKET_DATA_TYPES, **(types or {})}
+        index = self.read_index()
+        dates, prices = self._arrays(index)
+        entries, parsed, changed = {}, {}, set(index["series"]) - set(sources)
+
+        for name, path in sources.items():
+            stat = os.stat(path)
+            entry = dict(index["series"].get(name, {}))
+            if entry.get("mtime_ns") == stat.st_mtime_ns and entry.get("size") == stat.st_size \
+                    and entry.get("source") == path:
+                entries[name] = entry
+                continue
+            digest = file_digest(path)
+            entry.update(source=path, mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+            if entry.get("sha256") != digest or SERIES_TYPES.get(entry.get("type")) is not types.get(name):
+                if name not in types:
+                    raise NotImplementedError(f"Type de données non supporté : {name}")
+                series = MarketDataPreprocessing(path).build_series(name, types[name])
+                parsed[name] = series.as_arrays()
+                entry.update(sha256=digest, type=types[name].__name__)
+                changed.add(name)
+            entries[name] = entry
+
+        if changed:
+            # Consolidation : tranches conservées lues sur les tableaux courants, séries parsées ajoutées
+            new_dates, new_prices, offset = [], [], 0
+            for name, entry in entries.items():
+                if name in parsed:
+                    series_dates, series_prices = parsed[name]
+                else:
+                    start, stop = entry["offset"], entry["offset"] + entry["length"]
+                    series_dates, series_prices = dates[start:stop], prices[start:stop]
+                entry.update(offset=offset, length=len(series_dates))
+                new_dates.append(series_dates)
+                new_prices.append(series_prices)
+                offset += len(series_dates)
+
+            previous, generation = index["generation"], index["generation"] + 1
+            np.save(self._array_path("dates", generation), np.concatenate(new_dates).astype(np.int64))
+            np.save(self._array_path("prices", generation), np.concatenate(new_prices).astype(np.float64))
+            del dates, prices
+            self._write_index({"format": STORE_FORMAT, "generation": generation, "series": entries})
+            for kind in ("dates", "prices"):
+                if os.path.exists(self._array_path(kind, previous)):
+                    os.remove(self._array_path(kind, previous))
+        elif entries != index["series"]:
+            self._write_index({**index, "series": entries})
+        return sorted(parsed)
+
+    def load(self, names: list = None) -> dict:
+        """
+        Charge les séries `names` (toutes par défaut) : {nom: Equity | Rate | Commodity},
+        chaque série étant une vue sur les tableaux memory-mappés du store.
+        """
+        index = self.read_index()
+        dates, prices = self._arrays(index)
+        market_data = {}
+        for name in names or index["series"]:
+            entry = index["series"][name]
+            start, stop = entry["offset"], entry["offset"] + entry["length"]
+            market_data[name] = SERIES_TYPES[entry["type"]].from_arrays(name, dates[start:stop], prices[start:stop])
+        return market_data
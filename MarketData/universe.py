@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: babacardiallo
+"""
+from collections.abc import Mapping
+from functools import reduce
+
+import numpy as np
+import pandas as pd
+
+from correlation import sample_correlation
+
+
+class MarketDataUniverse(Mapping):
+    """
+    Univers de marché aligné sur les dates : construit une seule fois une matrice
+    de prix (dates x actifs) et la matrice des rendements logarithmiques associée,
+    contiguës en float64. Toutes les étapes de calibration (volatilité, corrélation)
+    lisent ces matrices au lieu de retrier et recalculer chaque série.
+
+    L'alignement se fait sur l'intersection des dates des séries (ex. les jours
+    fériés présents dans une seule série sont écartés).
+    Se comporte comme le dict `market_data` d'origine ({nom: série}).
+
+    Attributs :
+    -----------
+    - assets : list -> Noms des actifs (ordre des colonnes)
+    - dates : np.ndarray -> Dates communes triées (datetime64[ns])
+    - prices : np.ndarray -> Matrice des prix (n_dates, n_actifs)
+    - returns : np.ndarray -> Matrice des log-rendements (n_dates - 1, n_actifs)
+    """
+
+    def __init__(self, market_data: dict):
+        self.market_data = market_data
+        self.assets = list(market_data)
+
+        arrays = [market_data[asset].as_arrays() for asset in self.assets]
+        common_dates = reduce(np.intersect1d, [dates for dates, _ in arrays])
+
+        self.prices = np.empty((len(common_dates), len(self.assets)), dtype=np.float64)
+        for j, (dates, prices) in enumerate(arrays):
+            self.prices[:, j] = prices[np.searchsorted(dates, common_dates)]
+
+        self.dates = common_dates.view("datetime64[ns]")
+        self.returns = np.ascontiguousarray(np.diff(np.log(self.prices), axis=0))
+
+    @classmethod
+    def of(cls, market_data):
+        """
+        Retourne `market_data` tel quel s'il s'agit déjà d'un univers, sinon le construit.
+        """
+        return market_data if isinstance(market_data, cls) else cls(market_data)
+
+    def until(self, date) -> "MarketDataUniverse":
+        """
+        Univers restreint aux dates <= `date` (vues sur les matrices, sans copie), pour
+        calibrer à une date passée sans information postérieure. Les séries d'origine
+        restent complètes : les lookups par date (spots) sont inchangés.
+        """
+        end = int(np.searchsorted(self.dates, np.datetime64(pd.Timestamp(date), "ns"), side="right"))
+        universe = object.__new__(type(self))
+        universe.market_data, universe.assets = self.market_data, self.assets
+        universe.prices, universe.dates = self.prices[:end], self.dates[:end]
+        universe.returns = self.returns[:max(end - 1, 0)]
+        return universe
+
+    def column(self, asset: str) -> int:
+        return self.assets.index(asset)
+
+    def asset_returns(self, asset: str) -> np.ndarray:
+        """
+        Log-rendements alignés d'un actif (vue sur la matrice, sans copie).
+        """
+        return self.returns[:, self.column(asset)]
+
+    def correlation(self) -> np.ndarray:
+        """
+        Matrice de corrélation des log-rendements alignés sur les dates (sample_correlation :
+        une série constante est décorrélée des autres au lieu de donner des NaN).
+        """
+        return sample_correlation(self.returns)
+
+    def __getitem__(self, asset: str):
+        return self.market_data[asset]
+
+    def __iter__(self):
+        return iter(self.assets)
+
+    def __len__(self) -> int:
+        return len(self.assets)
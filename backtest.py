@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: babacardiallo
+"""
+import copy
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from scipy.special import xlogy
+from scipy.stats import chi2
+
+import launcher
+from MarketData.universe import MarketDataUniverse
+from portfolio import position_weight
+from pricer.engine import KERNELS, BookPricer, Revaluation, required_statistics
+
+# Nombre minimal de rendements historiques pour calibrer le modèle à une date du backtest
+MIN_HISTORY = 100
+
+
+def kupiec_pof(exceptions: int, observations: int, coverage: float):
+    """
+    Test de couverture non conditionnelle de Kupiec (proportion of failures) :
+    LR = -2 ln[(1-p)^(n-x) p^x / (1-x/n)^(n-x) (x/n)^x], khi-deux à 1 degré de liberté.
+    Retourne (statistique LR, p-value).
+    """
+    x, n, p = exceptions, observations, coverage
+    rate = x / n
+    lr = -2 * (xlogy(n - x, 1 - p) + xlogy(x, p) - xlogy(n - x, 1 - rate) - xlogy(x, rate))
+    return float(lr), float(chi2.sf(lr, 1))
+
+
+def christoffersen_independence(hits: np.ndarray):
+    """
+    Test d'indépendance de Christoffersen : les exceptions du jour dépendent-elles de
+    celles de la veille (chaîne de Markov d'ordre 1 contre probabilité constante) ?
+    Retourne (statistique LR, p-value), khi-deux à 1 degré de liberté.
+    """
+    hits = np.asarray(hits, dtype=bool)
+    previous, current = hits[:-1], hits[1:]
+    n00, n01 = np.sum(~previous & ~current), np.sum(~previous & current)
+    n10, n11 = np.sum(previous & ~current), np.sum(previous & current)
+    pi01 = n01 / (n00 + n01) if n00 + n01 else 0.0
+    pi11 = n11 / (n10 + n11) if n10 + n11 else 0.0
+    pi = (n01 + n11) / len(current) if len(current) else 0.0
+    restricted = xlogy(n00 + n10, 1 - pi) + xlogy(n01 + n11, pi)
+    unrestricted = xlogy(n00, 1 - pi01) + xlogy(n01, pi01) + xlogy(n10, 1 - pi11) + xlogy(n11, pi11)
+    lr = max(-2 * (restricted - unrestricted), 0.0)
+    return float(lr), float(chi2.sf(lr, 1))
+
+
+class RunningMoments:
+    """
+    Sommes courantes des rendements et de leurs produits croisés : la corrélation
+    empirique de la fenêtre croissante est mise à jour en O(N²) par nouvelle date,
+    au lieu d'être recalculée sur tout l'historique (O(T N²)).
+
+    Paramètres :
+    ------------
+    - returns : np.ndarray -> Rendements initiaux (T, N)
+    """
+
+    def __init__(self, returns: np.ndarray):
+        self.count = len(returns)
+        self.total = returns.sum(axis=0)
+        self.cross = returns.T @ returns
+
+    def update(self, row: np.ndarray):
+        self.count += 1
+        self.total += row
+        self.cross += np.outer(row, row)
+
+    def correlation(self) -> np.ndarray:
+        """
+        Identique à sample_correlation sur les rendements accumulés (série constante : corrélation nulle).
+        """
+        mean = self.total / self.count
+        covariance = self.cross / self.count - np.outer(mean, mean)
+        std = np.sqrt(np.maximum(np.diag(covariance), 0))
+        std = np.where(std > 0, std, 1.0)
+        correlation = covariance / np.outer(std, std)
+        np.fill_diagonal(correlation, 1.0)
+        return correlation
+
+
+@dataclass
+class BacktestResult:
+    """
+    VaR prévue et PnL réalisé du book à chaque date du backtest.
+
+    Paramètres :
+    ------------
+    - dates : np.ndarray -> Dates de calcul (datetime64[ns])
+    - target_dates : np.ndarray -> Dates de réalisation du PnL
+    - var : np.ndarray -> VaR (quantile 1 - threshold du PnL simulé, négative en cas de perte)
+    - realized : np.ndarray -> PnL réalisé du book entre date de calcul et date cible
+    - threshold : float -> Niveau de confiance
+    """
+    dates: np.ndarray
+    target_dates: np.ndarray
+    var: np.ndarray
+    realized: np.ndarray
+    threshold: float
+
+    @property
+    def exceptions(self) -> np.ndarray:
+        """
+        Dates où la perte réalisée dépasse la VaR.
+        """
+        return self.realized < self.var
+
+    def kupiec(self):
+        return kupiec_pof(int(self.exceptions.sum()), len(self.var), 1 - self.threshold)
+
+    def christoffersen(self):
+        """
+        Tests d'indépendance et de couverture conditionnelle (Kupiec + indépendance,
+        khi-deux à 2 degrés de liberté) : {"independence": (LR, p), "conditional_coverage": (LR, p)}.
+        Pour un horizon de plus d'une date, les fenêtres se chevauchent et les exceptions
+        sont autocorrélées par construction : le test d'indépendance est alors indicatif.
+        """
+        lr_ind, p_ind = christoffersen_independence(self.exceptions)
+        lr_cc = self.kupiec()[0] + lr_ind
+        return {"independence": (lr_ind, p_ind), "conditional_coverage": (lr_cc, float(chi2.sf(lr_cc, 2)))}
+
+    def summary(self) -> dict:
+        christoffersen = self.christoffersen()
+        return {
+            "Observations": len(self.var),
+            "Exceptions": int(self.exceptions.sum()),
+            "Exceptions attendues": len(self.var) * (1 - self.threshold),
+            "Kupiec (LR, p-value)": self.kupiec(),
+            "Christoffersen indépendance (LR, p-value)": christoffersen["independence"],
+            "Christoffersen couverture conditionnelle (LR, p-value)": christoffersen["conditional_coverage"],
+        }
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame({"Date": self.dates, "Date cible": self.target_dates, "VaR": self.var,
+                             "PnL réalisé": self.realized, "Exception": self.exceptions})
+
+
+class RollingBacktest:
+    """
+    Backtest de la VaR du book sur l'historique : à chaque date de l'historique
+    (après `min_history` rendements), la VaR à `horizon` dates de marché est calculée
+    avec l'information disponible à cette date, puis comparée au PnL réalisé du book
+    (transactions actuelles, revalorisées aux spots observés à la date cible).
+
+    Les dates sont parcourues dans l'ordre, sans repartir de zéro :
+    - la corrélation empirique est mise à jour par sommes courantes (RunningMoments) ;
+      les modèles 'ledoit_wolf' et 'factor' sont réestimés sur la fenêtre ;
+    - avec le moteur GARCH 'batched' (par défaut), chaque ajustement part des paramètres
+      de la veille (quelques itérations de Newton au lieu d'un ajustement complet) ;
+    - les scénarios sont produits et revalorisés par blocs de `chunk_size`, comme
+      dans VaRMCEvaluator, avec une graine dérivée de la graine de la diffusion et
+      de l'indice de la date.
+    Avec n_workers > 1, les dates sont réparties en blocs contigus, un par processus ;
+    la première date de chaque bloc est calibrée sans départ à chaud, d'où des écarts
+    possibles (optimum GARCH atteint depuis un autre point de départ) avec n_workers = 1.
+
+    Paramètres :
+    ------------
+    - evaluator : VaRMCEvaluator -> Paramètres de la VaR (seuil, diffusion, nombre de scénarios)
+    - deals : dict -> Book {deal_id: Deal}
+    - market_data : dict -> Données de marché (tout l'historique)
+    - horizon : int -> Horizon de la VaR en dates de marché (1 : date suivante)
+    - min_history : int -> Nombre minimal de rendements avant la première date
+    - garch_backend : str -> Moteur GARCH du backtest ('batched' : départ à chaud ; 'arch')
+    """
+
+    def __init__(self, evaluator, deals: dict, market_data: dict, horizon: int = 1, min_history: int = MIN_HISTORY,
+                 garch_backend: str = "batched"):
+        if evaluator.scenario_generator != "monte_carlo":
+            raise ValueError("Le backtest porte sur la VaR Monte Carlo (scenario_generator='monte_carlo')")
+        self.diffusion = copy.copy(evaluator.mc_diffusion)
+        self.diffusion.garch_params = {}
+        self.diffusion.garch_backend = garch_backend
+        self.seed = evaluator.mc_diffusion.seed
+        self.threshold = evaluator.threshold
+        self.deals = deals
+        self.path_statistics = required_statistics(deals)
+        self.weights = {deal_id: position_weight(deal) for deal_id, deal in deals.items()}
+        # Le book ne change pas d'une date à l'autre : BookPricer construit une fois pour toutes
+        vectorized = {deal_id: deal for deal_id, deal in deals.items() if type(deal) in KERNELS}
+        self.book = BookPricer.from_deals(vectorized) if vectorized else None
+        self.universe = MarketDataUniverse.of(market_data)
+        self.horizon = horizon
+        # Indices (dans universe.dates) des dates de calcul
+        self.indices = np.arange(max(min_history, 1), len(self.universe.dates) - horizon)
+
+    def _dates(self, index: int):
+        return pd.Timestamp(self.universe.dates[index]), pd.Timestamp(self.universe.dates[index + self.horizon])
+
+    def _revaluation(self, date, target_date) -> Revaluation:
+        """
+        Revalorisation du book de `date` à `target_date` : prix du jour calculés une fois,
+        réutilisés pour tous les blocs de scénarios de la date.
+        """
+        return Revaluation(self.deals, date, target_date, self.universe, self.book)
+
+    def realized_pnl(self) -> np.ndarray:
+        """
+        PnL réalisé du book à chaque date : revalorisation aux spots observés à la date cible.
+        """
+        return np.array([float(np.sum(self._revaluation(*self._dates(index)).weighted_pnl(self.universe,
+                                                                                           self.weights)))
+                         for index in self.indices])
+
+    def _run_block(self, indices: np.ndarray) -> np.ndarray:
+        """
+        VaR des dates `indices` (contiguës), calculées dans l'ordre avec mise à jour incrémentale.
+        """
+        diffusion = self.diffusion
+        moments = RunningMoments(self.universe.returns[:indices[0]])
+        values = np.empty(len(indices))
+        for k, index in enumerate(indices):
+            if k > 0:
+                moments.update(self.universe.returns[index - 1])
+            date, target_date = self._dates(index)
+            T_days = (target_date - date).days
+            window = self.universe.until(date)
+
+            diffusion.date = date
+            diffusion.seed = int(np.random.SeedSequence(self.seed, spawn_key=(int(index),)).generate_state(1)[0])
+            vol_estimation = diffusion.volatility_estimation(window, T_days)
+            correlation = (moments.correlation() if diffusion.correlation_model == "sample"
+                           else diffusion.correlation_estimation(window))
+            mixing = diffusion.correlation_mixing(window, correlation)
+            revaluation = self._revaluation(date, target_date)
+
+            total = np.empty(diffusion.number_samples)
+            offset = 0
+            for chunk_index, size in diffusion.chunks():
+                scenario_set = diffusion.scenario_chunk(window, vol_estimation, mixing, (T_days,),
+                                                        chunk_index, size, self.path_statistics)[T_days]
+                market_state = scenario_set.market_state(self.universe)
+                total[offset:offset + size] = revaluation.weighted_pnl(market_state, self.weights)
+                offset += size
+            values[k] = np.percentile(total, (1 - self.threshold) * 100)
+        return values
+
+    def run(self, n_workers: int = 1) -> BacktestResult:
+        blocks = [block for block in np.array_split(self.indices, max(n_workers, 1)) if len(block)]
+        if n_workers > 1 and len(blocks) > 1:
+            with ProcessPoolExecutor(max_workers=len(blocks)) as executor:
+                var = np.concatenate(list(executor.map(self._run_block, blocks)))
+        else:
+            var = np.concatenate([self._run_block(block) for block in blocks])
+        return BacktestResult(dates=self.universe.dates[self.indices],
+                              target_dates=self.universe.dates[self.indices + self.horizon],
+                              var=var, realized=self.realized_pnl(), threshold=self.threshold)
+
+
+def main():
+    backtest = RollingBacktest(launcher.build_evaluator(), launcher.load_deals(), launcher.load_market_data())
+    result = backtest.run(n_workers=launcher.n_workers)
+    print(f"\n=== Backtest de la VaR du book ({result.threshold:.0%}, horizon : {backtest.horizon} date) ===")
+    for name, value in result.summary().items():
+        print(f"   - {name} : {value}")
+
+
+if __name__ == "__main__":
+    main()
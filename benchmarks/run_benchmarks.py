@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Suite de benchmarks du pipeline VaR : calibration GARCH, diffusion Monte Carlo,
+pricers et évaluation complète, sur des univers et books synthétiques.
+
+Usage (depuis la racine du dépôt) :
+    python -m benchmarks.run_benchmarks --profile quick --output bench_output.json
+
+Le rapport JSON contient, pour chaque cas, les paramètres du balayage, les temps
+(médiane / min sur `repeats` exécutions) et un débit. Les temps sont comparés aux
+seuils de `benchmarks/thresholds.json` ; tout dépassement est listé dans
+"regressions" et le script retourne un code de sortie non nul.
+
+@author: babacardiallo
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import synthetic_book, synthetic_universe
+from evaluator import VaRMCEvaluator
+from mc_diffusion import MCDiffusion
+from MarketData.universe import MarketDataUniverse
+from pricer.factory import PricerFactory
+
+CALCULATION_DATE = '03/15/2024'
+THRESHOLDS_PATH = os.path.join(os.path.dirname(__file__), 'thresholds.json')
+
+# Grilles de balayage : nombre de scénarios, de transactions, d'actifs et horizon
+PROFILES = {
+    "quick": {
+        "volatility_estimation": {"assets": [3, 10], "horizon": [10]},
+        "diffuse": {"samples": [10_000, 50_000], "assets": [3, 10], "horizon": [10, 30]},
+        "pricer": {"samples": [10_000, 100_000]},
+        "evaluate": {"samples": [10_000], "deals": [3, 30], "assets": [3], "horizon": [10]},
+    },
+    "full": {
+        "volatility_estimation": {"assets": [3, 10, 50], "horizon": [10, 30]},
+        "diffuse": {"samples": [10_000, 100_000, 1_000_000], "assets": [3, 10, 50], "horizon": [1, 10, 30]},
+        "pricer": {"samples": [10_000, 100_000, 1_000_000]},
+        "evaluate": {"samples": [10_000, 100_000], "deals": [3, 30, 300], "assets": [3, 10], "horizon": [10, 30]},
+    },
+}
+
+
+def _time(fn, repeats: int) -> list:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _grid(sweep: dict):
+    names = list(sweep)
+    for values in itertools.product(*(sweep[name] for name in names)):
+        yield dict(zip(names, values))
+
+
+def _case_name(stage: str, params: dict) -> str:
+    return stage + "[" + ",".join(f"{name}={value}" for name, value in params.items()) + "]"
+
+
+def _record(results: list, stage: str, params: dict, timings: list, work: int):
+    median = float(np.median(timings))
+    results.append({
+        "name": _case_name(stage, params),
+        "stage": stage,
+        "params": params,
+        "median_seconds": median,
+        "min_seconds": float(np.min(timings)),
+        "repeats": len(timings),
+        "throughput_per_second": work / median if median > 0 else None,
+    })
+    print(f"{results[-1]['name']:<70} {median:10.4f} s", file=sys.stderr)
+
+
+def bench_volatility_estimation(sweep: dict, repeats: int, results: list):
+    for params in _grid(sweep):
+        universe = MarketDataUniverse(synthetic_universe(params["assets"], CALCULATION_DATE))
+        diffusion = MCDiffusion(CALCULATION_DATE, 1, 1)
+        timings = _time(lambda: diffusion.volatility_estimation(universe, params["horizon"]), repeats)
+        _record(results, "volatility_estimation", params, timings, params["assets"])
+
+
+def bench_diffuse(sweep: dict, repeats: int, results: list, cache_dir: str):
+    # Calibration lue depuis un cache chaud : on mesure la génération des scénarios
+    for params in _grid(sweep):
+        universe = MarketDataUniverse(synthetic_universe(params["assets"], CALCULATION_DATE))
+        diffusion = MCDiffusion(CALCULATION_DATE, params["samples"], 1, cache_dir=cache_dir, chunk_size=50_000)
+        diffusion.calibrate(universe, params["horizon"])
+        timings = _time(lambda: diffusion.diffuse(universe, params["horizon"]), repeats)
+        _record(results, "diffuse", params, timings, params["samples"] * params["assets"] * params["horizon"])
+
+
+def bench_pricer(sweep: dict, repeats: int, results: list):
+    universe = synthetic_universe(1, CALCULATION_DATE)
+    spot = next(iter(universe.values())).get_by_date(CALCULATION_DATE)
+    book = synthetic_book(30, universe, CALCULATION_DATE)
+    deals_by_type = {deal.get_class_name(): deal for deal in book.values()}
+
+    for deal_type, deal in sorted(deals_by_type.items()):
+        pricer = PricerFactory.create_pricer(CALCULATION_DATE, deal)
+        timings = _time(lambda: pricer.calculate(universe), repeats)
+        _record(results, f"{deal_type.lower()}_calculate", {}, timings, 1)
+
+        for params in _grid(sweep):
+            spots = spot * np.exp(0.05 * np.random.default_rng(0).standard_normal(params["samples"]))
+            timings = _time(lambda: pricer.calculate_batch(spots), repeats)
+            _record(results, f"{deal_type.lower()}_calculate_batch", params, timings, params["samples"])
+
+
+def bench_evaluate(sweep: dict, repeats: int, results: list, cache_dir: str):
+    for params in _grid(sweep):
+        universe = synthetic_universe(params["assets"], CALCULATION_DATE)
+        book = synthetic_book(params["deals"], universe, CALCULATION_DATE)
+        evaluator = VaRMCEvaluator(CALCULATION_DATE, params["samples"], 1, threshold=0.99, cache_dir=cache_dir,
+                                   chunk_size=50_000)
+
+        def run():
+            with contextlib.redirect_stdout(io.StringIO()):
+                evaluator.evaluate(book, universe, params["horizon"])
+
+        run()  # Calibration mise en cache
+        timings = _time(run, repeats)
+        _record(results, "evaluate", params, timings, params["samples"] * params["deals"])
+
+
+def check_thresholds(results: list, thresholds: dict, tolerance: float) -> list:
+    """
+    Compare les temps médians aux seuils {nom du cas: {"max_seconds": s}}.
+    Retourne la liste des régressions détectées.
+    """
+    regressions = []
+    for result in results:
+        threshold = thresholds.get(result["name"])
+        if threshold is None:
+            continue
+        limit = threshold["max_seconds"] * (1 + tolerance)
+        if result["median_seconds"] > limit:
+            regressions.append({"name": result["name"], "median_seconds": result["median_seconds"],
+                                "max_seconds": limit})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks du pipeline VaR Monte Carlo.")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="quick")
+    parser.add_argument("--stages", nargs="*", default=list(PROFILES["quick"]),
+                        help="Etapes à mesurer (volatility_estimation, diffuse, pricer, evaluate).")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", help="Fichier du rapport JSON (sortie standard par défaut).")
+    parser.add_argument("--thresholds", default=THRESHOLDS_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.0,
+                        help="Marge relative ajoutée aux seuils avant de signaler une régression.")
+    args = parser.parse_args(argv)
+
+    warnings.filterwarnings("ignore")  # Avertissements de mise à l'échelle d'arch sur les séries synthétiques
+    profile = PROFILES[args.profile]
+    results = []
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        if "volatility_estimation" in args.stages:
+            bench_volatility_estimation(profile["volatility_estimation"], args.repeats, results)
+        if "diffuse" in args.stages:
+            bench_diffuse(profile["diffuse"], args.repeats, results, cache_dir)
+        if "pricer" in args.stages:
+            bench_pricer(profile["pricer"], args.repeats, results)
+        if "evaluate" in args.stages:
+            bench_evaluate(profile["evaluate"], args.repeats, results, cache_dir)
+
+    thresholds = {}
+    if args.thresholds and os.path.exists(args.thresholds):
+        with open(args.thresholds) as f:
+            thresholds = json.load(f)
+    regressions = check_thresholds(results, thresholds, args.tolerance)
+
+    report = {
+        "profile": args.profile,
+        "created": pd.Timestamp.now().isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+        "regressions": regressions,
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+    for regression in regressions:
+        print(f"REGRESSION {regression['name']}: {regression['median_seconds']:.4f} s "
+              f"> {regression['max_seconds']:.4f} s", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
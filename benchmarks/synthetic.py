@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Générateurs de données synthétiques pour les benchmarks : univers de marché
+(séries de prix GBM corrélées) et books de transactions (Call / Put / Future).
+
+@author: babacardiallo
+"""
+import numpy as np
+import pandas as pd
+
+from Deal.deal import Call, Put, Future
+from MarketData.marketdata import Equity
+
+
+def synthetic_universe(number_assets: int, calculation_date: str, history_days: int = 260, seed: int = 0) -> dict:
+    """
+    Construit {nom: Equity} : `number_assets` séries de `history_days` jours ouvrés
+    se terminant à `calculation_date`, diffusées par un GBM à un facteur commun
+    (corrélation positive, matrice définie positive).
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end=pd.Timestamp(calculation_date), periods=history_days)
+
+    vols = rng.uniform(0.1, 0.4, size=number_assets) / np.sqrt(252)
+    loadings = rng.uniform(0.2, 0.8, size=number_assets)
+    market = rng.standard_normal(size=(history_days - 1, 1))
+    idiosyncratic = rng.standard_normal(size=(history_days - 1, number_assets))
+    shocks = loadings * market + np.sqrt(1 - loadings ** 2) * idiosyncratic
+
+    log_prices = np.vstack([np.zeros(number_assets), np.cumsum(vols * shocks, axis=0)])
+    prices = rng.uniform(20, 5000, size=number_assets) * np.exp(log_prices)
+
+    return {
+        f"SYN{j:04d}": Equity(name=f"SYN{j:04d}", data=pd.DataFrame({"Date": dates, "Price": prices[:, j]}))
+        for j in range(number_assets)
+    }
+
+
+def synthetic_book(number_deals: int, market_data: dict, calculation_date: str, seed: int = 0) -> dict:
+    """
+    Construit {deal_id: Deal} : Call, Put et Future répartis aléatoirement sur les
+    sous-jacents de `market_data`, strikes autour du spot et maturités de 3 à 12 mois.
+    """
+    rng = np.random.default_rng(seed)
+    date = pd.Timestamp(calculation_date)
+    underlyings = list(market_data)
+
+    deals = {}
+    for i in range(number_deals):
+        underlying = underlyings[rng.integers(len(underlyings))]
+        spot = market_data[underlying].get_by_date(date)
+        common = dict(
+            deal_id=f"Deal {i}",
+            position=str(rng.choice(["Long", "Short"])),
+            notional=float(rng.choice([50, 100, 150])),
+            currency="EUR",
+            underlying=underlying,
+            rate_const=float(rng.uniform(0.0, 0.05)),
+            start_date=date.to_pydatetime(),
+            maturity=(date + pd.Timedelta(days=int(rng.integers(90, 365)))).to_pydatetime(),
+        )
+        kind = rng.integers(3)
+        if kind == 2:
+            deals[common["deal_id"]] = Future(**common)
+        else:
+            deal_type = Call if kind == 0 else Put
+            deals[common["deal_id"]] = deal_type(vol_const=float(rng.uniform(0.1, 0.4)),
+                                                 strike=float(spot * rng.uniform(0.8, 1.2)), **common)
+    return deals
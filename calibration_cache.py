@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: babacardiallo
+"""
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+
+class CalibrationCache:
+    """
+    Cache disque des résultats de calibration (paramètres GARCH, prévisions de
+    volatilité, matrice de corrélation et facteur de Cholesky).
+
+    La clé combine le hash du contenu des séries de marché, la date de calcul,
+    l'horizon et la spécification du modèle : toute modification d'un CSV
+    source change le hash et invalide automatiquement l'entrée.
+
+    Paramètres :
+    ------------
+    - cache_dir : str -> Répertoire de stockage des fichiers .npz
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(market_data: dict, date, T_days: int, model_spec: str) -> str:
+        """
+        Construit la clé de cache (sha256) à partir du contenu des séries,
+        de la date de calcul, de l'horizon et de la spécification du modèle.
+        """
+        h = hashlib.sha256()
+        for asset in sorted(market_data):
+            data = market_data[asset].data
+            h.update(asset.encode())
+            h.update(pd.to_datetime(data["Date"]).to_numpy(dtype="datetime64[ns]").view(np.int64).tobytes())
+            h.update(data["Price"].to_numpy(dtype=np.float64).tobytes())
+        h.update(pd.Timestamp(date).isoformat().encode())
+        h.update(str(T_days).encode())
+        h.update(model_spec.encode())
+        return h.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def load(self, key: str):
+        """
+        Retourne le dictionnaire des tableaux stockés pour `key`, ou None si absent.
+        """
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as cached:
+            return {name: cached[name] for name in cached.files}
+
+    def save(self, key: str, **arrays):
+        """
+        Ecrit les tableaux de calibration de façon atomique (fichier temporaire puis renommage).
+        """
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: babacardiallo
+"""
+import numpy as np
+
+# Modèles de corrélation disponibles pour la diffusion
+CORRELATION_MODELS = ("sample", "ledoit_wolf", "factor")
+
+# Plus petite valeur propre conservée après réparation (garantit la décomposition de Cholesky)
+MIN_EIGENVALUE = 1e-8
+
+
+def standardize(returns: np.ndarray) -> np.ndarray:
+    """
+    Rendements centrés réduits (écart-type de population), colonne par colonne.
+    Une série constante donne une colonne nulle (corrélation nulle avec les autres).
+    """
+    centered = returns - returns.mean(axis=0)
+    std = centered.std(axis=0)
+    return centered / np.where(std > 0, std, 1.0)
+
+
+def sample_correlation(returns: np.ndarray) -> np.ndarray:
+    """
+    Matrice de corrélation empirique, à diagonale unité.
+    """
+    X = standardize(returns)
+    correlation = X.T @ X / len(X)
+    np.fill_diagonal(correlation, 1.0)
+    return correlation
+
+
+def ledoit_wolf_correlation(returns: np.ndarray):
+    """
+    Corrélation rétrécie vers l'identité, intensité optimale de Ledoit-Wolf (2004) :
+    delta = min(b², d²) / d², avec d² = ||S - I||² et b² = somme_t ||x_t x_t' - S||² / T².
+    Reste définie positive lorsque le nombre d'observations est inférieur au nombre d'actifs.
+    Retourne (matrice de corrélation, intensité delta).
+    """
+    X = standardize(returns)
+    T = len(X)
+    S = X.T @ X / T
+    d2 = np.sum((S - np.eye(len(S))) ** 2)
+    # somme_t ||x_t x_t' - S||² = somme_t ||x_t||⁴ - T ||S||², sans matrice N x N par date
+    b2 = min((np.sum(np.sum(X ** 2, axis=1) ** 2) - T * np.sum(S ** 2)) / T ** 2, d2)
+    delta = b2 / d2 if d2 > 0 else 1.0
+    correlation = (1 - delta) * S + delta * np.eye(len(S))
+    np.fill_diagonal(correlation, 1.0)
+    return correlation, delta
+
+
+def nearest_correlation(matrix: np.ndarray, tolerance: float = 1e-8, max_iterations: int = 200,
+                        min_eigenvalue: float = MIN_EIGENVALUE) -> np.ndarray:
+    """
+    Matrice de corrélation la plus proche (norme de Frobenius) d'une matrice symétrique
+    quelconque : projections alternées de Higham (2002) avec correction de Dykstra,
+    entre le cône des matrices semi-définies positives et les matrices à diagonale unité.
+    Les valeurs propres sont ensuite relevées à `min_eigenvalue` (puis la diagonale
+    renormalisée) pour que la décomposition de Cholesky soit possible.
+    """
+    Y = (matrix + matrix.T) / 2
+    correction = np.zeros_like(Y)
+    for _ in range(max_iterations):
+        R = Y - correction
+        eigenvalues, eigenvectors = np.linalg.eigh(R)
+        X = (eigenvectors * np.maximum(eigenvalues, 0)) @ eigenvectors.T
+        correction = X - R
+        previous, Y = Y, X.copy()
+        np.fill_diagonal(Y, 1.0)
+        if np.linalg.norm(Y - previous) <= tolerance * np.linalg.norm(Y):
+            break
+
+    eigenvalues, eigenvectors = np.linalg.eigh((Y + Y.T) / 2)
+    Y = (eigenvectors * np.maximum(eigenvalues, min_eigenvalue)) @ eigenvectors.T
+    scale = 1 / np.sqrt(np.diag(Y))
+    Y = Y * scale[:, None] * scale[None, :]
+    np.fill_diagonal(Y, 1.0)
+    return Y
+
+
+class CholeskyMixing:
+    """
+    Corrélation des chocs par le facteur de Cholesky L de la matrice de corrélation :
+    x = L z, avec autant de chocs indépendants que d'actifs (coût O(N²) par tirage).
+
+    Paramètres :
+    ------------
+    - cholesky : np.ndarray -> Facteur triangulaire inférieur (N, N)
+    """
+
+    kind = "cholesky"
+
+    def __init__(self, cholesky: np.ndarray):
+        self.cholesky = cholesky
+
+    @classmethod
+    def from_correlation(cls, correlation: np.ndarray) -> "CholeskyMixing":
+        """
+        Cholesky de la matrice ; si elle n'est pas définie positive (historiques courts ou
+        désalignés), elle est d'abord remplacée par la corrélation valide la plus proche.
+        """
+        try:
+            return cls(np.linalg.cholesky(correlation))
+        except np.linalg.LinAlgError:
+            return cls(np.linalg.cholesky(nearest_correlation(correlation)))
+
+    @property
+    def n_shocks(self) -> int:
+        return len(self.cholesky)
+
+    def mix(self, z: np.ndarray) -> np.ndarray:
+        """
+        Chocs indépendants (samples, n_shocks) -> chocs corrélés (samples, actifs).
+        """
+        return z @ self.cholesky.T
+
+    def correlation(self) -> np.ndarray:
+        return self.cholesky @ self.cholesky.T
+
+    def to_arrays(self) -> dict:
+        return {"cholesky": self.cholesky}
+
+
+class FactorMixing:
+    """
+    Modèle à k facteurs (ACP) : corrélation = B B' + D, avec B (N, k) les k premières
+    composantes principales et D diagonale telle que la diagonale vaille 1.
+    Les chocs corrélés sont x = B f + sqrt(D) e (k chocs communs, N idiosyncratiques) :
+    coût O(N k) par tirage, définie positive par construction.
+
+    Paramètres :
+    ------------
+    - loadings : np.ndarray -> Sensibilités aux facteurs B (N, k)
+    - idiosyncratic : np.ndarray -> Variances spécifiques diag(D) (N,)
+    """
+
+    kind = "factor"
+
+    def __init__(self, loadings: np.ndarray, idiosyncratic: np.ndarray):
+        self.loadings = loadings
+        self.idiosyncratic = idiosyncratic
+        self._idiosyncratic_std = np.sqrt(idiosyncratic)
+
+    @classmethod
+    def _from_components(cls, eigenvectors: np.ndarray, eigenvalues: np.ndarray) -> "FactorMixing":
+        loadings = eigenvectors * np.sqrt(np.maximum(eigenvalues, 0))
+        # Une ligne de norme > 1 (bruit d'estimation) est ramenée à 1 : variance spécifique nulle
+        norms = np.sqrt(np.sum(loadings ** 2, axis=1))
+        loadings /= np.maximum(norms, 1.0)[:, None]
+        return cls(loadings, np.maximum(1 - np.sum(loadings ** 2, axis=1), 0.0))
+
+    @classmethod
+    def from_returns(cls, returns: np.ndarray, factors: int) -> "FactorMixing":
+        """
+        ACP directement sur les rendements centrés réduits (SVD de la matrice T x N) :
+        la matrice de corrélation N x N n'est jamais formée.
+        """
+        X = standardize(returns) / np.sqrt(len(returns))
+        _, singular_values, components = np.linalg.svd(X, full_matrices=False)
+        return cls._from_components(components[:factors].T, singular_values[:factors] ** 2)
+
+    @property
+    def factors(self) -> int:
+        return self.loadings.shape[1]
+
+    @property
+    def n_shocks(self) -> int:
+        return self.factors + len(self.loadings)
+
+    def mix(self, z: np.ndarray) -> np.ndarray:
+        """
+        Chocs indépendants (samples, k + N) -> chocs corrélés (samples, N).
+        """
+        return z[:, :self.factors] @ self.loadings.T + z[:, self.factors:] * self._idiosyncratic_std
+
+    def correlation(self) -> np.ndarray:
+        correlation = self.loadings @ self.loadings.T
+        correlation[np.diag_indices_from(correlation)] += self.idiosyncratic
+        return correlation
+
+    def to_arrays(self) -> dict:
+        return {"loadings": self.loadings, "idiosyncratic": self.idiosyncratic}
+
+
+MIXINGS = {mixing.kind: mixing for mixing in (CholeskyMixing, FactorMixing)}
+
+
+def mixing_from_arrays(kind: str, arrays: dict):
+    """
+    Reconstruit un modèle de mélange à partir de `kind` et de ses tableaux (ex. relus du cache).
+    """
+    return MIXINGS[kind](**arrays)
+
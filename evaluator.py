@@ -8,131 +8,420 @@ import numpy as np
 import pandas as pd
 
 from pricer.factory import PricerFactory
-from mc_diffusion import MCDiffusion
-from MarketData.marketdata import Equity, Rate
+from pricer.engine import BookPricer, KERNELS
+from pricer.sensitivity import SensitivityApproximation
+from pricer.interpolation import InterpolatedPricer
+from mc_diffusion import MCDiffusion, as_horizons
+from historical import HistoricalSimulation, SCENARIO_GENERATORS
+from streaming import StreamingPnL
+from instrumentation import NullInstrumentation
+from portfolio import PortfolioPnL, position_weight
+from pnl_cube import PnLCube
+from MarketData.universe import MarketDataUniverse
+
+class VaRResults(dict):
+    """
+    Résultats de la VaR par transaction ({deal_id: {...}}).
+    `metrics` contient le résumé d'instrumentation (None si désactivée) et
+    `portfolio` les matrices de PnL du book par horizon ({horizon: PortfolioPnL})
+    et `pnl_cube` le cube de PnL persisté sur disque (PnLCube), le cas échéant.
+    """
+    metrics = None
+    portfolio = None
+    pnl_cube = None
+
+
+class ChunkRevaluation:
+    """
+    Revalorisation d'un bloc de scénarios pour un groupe de transactions et d'horizons.
+    Objet sérialisable, exécuté tel quel dans les workers de MCDiffusion.map_scenarios.
+    Retourne la liste des couples (PnL, spot simulé du sous-jacent) du bloc, dans
+    l'ordre des pricers ; le spot sert de variable de contrôle.
+
+    Avec `vectorized`, les transactions d'un même horizon dont le type dispose d'un
+    noyau vectorisé sont valorisées ensemble par un BookPricer (un appel de noyau par
+    type et sous-jacent) ; les autres, et celles dont le pricer est interpolé
+    (InterpolatedPricer), le sont pricer par pricer.
+
+    Les revalorisations présentes dans `approximations` ({indice: SensitivityApproximation})
+    ne sont pas revalorisées : leur PnL est la forme quadratique en la variation du spot.
+    """
+
+    def __init__(self, market_data, horizons: list, pricers: list, theoretical_prices: list,
+                 instrumentation=None, vectorized: bool = True, approximations: dict = None):
+        self.market_data = market_data
+        self.horizons = horizons
+        self.pricers = pricers
+        self.theoretical_prices = theoretical_prices
+        self.instrumentation = instrumentation or NullInstrumentation()
+        self.approximations = approximations or {}
+
+        self.books = {}  # {horizon: (BookPricer, indices des pricers, prix théoriques)}
+        if vectorized:
+            columns = {}
+            for k, (horizon, pricer) in enumerate(zip(horizons, pricers)):
+                if (type(pricer.instrument) in KERNELS and k not in self.approximations
+                        and not isinstance(pricer, InterpolatedPricer)):
+                    columns.setdefault(horizon, []).append(k)
+            for horizon, index in columns.items():
+                book = BookPricer.from_deals({k: pricers[k].instrument for k in index})
+                self.books[horizon] = (book, index, np.array([theoretical_prices[k] for k in index]))
+
+    def __getstate__(self):
+        # L'instrumentation reste dans le processus principal
+        state = self.__dict__.copy()
+        state["instrumentation"] = NullInstrumentation()
+        return state
+
+    def _revalue(self, horizon, pricer, theoretical_price, market_state):
+        with self.instrumentation.stage("revaluation", deal_id=pricer.instrument.deal_id, horizon=horizon):
+            return pricer.calculate(market_state) - theoretical_price
+
+    def _revalue_book(self, horizon, market_state) -> dict:
+        book, index, theoretical_prices = self.books[horizon]
+        target_date = self.pricers[index[0]].calculation_date
+        with self.instrumentation.stage("revaluation", horizon=horizon):
+            pnl = book.price(target_date, market_state).T - theoretical_prices[:, None]
+        return dict(zip(index, pnl))
+
+    def __call__(self, scenario_sets: dict):
+        # Vue scénario par horizon : l'historique est partagé, seuls les spots simulés sont surchargés
+        market_states = {horizon: scenario_set.market_state(self.market_data)
+                         for horizon, scenario_set in scenario_sets.items()}
+        pnl = {}
+        if self.approximations:
+            with self.instrumentation.stage("approximation"):
+                for k, approximation in self.approximations.items():
+                    pnl[k] = approximation.pnl(scenario_sets[self.horizons[k]][self.pricers[k].instrument.underlying])
+        for horizon in self.books:
+            pnl.update(self._revalue_book(horizon, market_states[horizon]))
+        for k, (horizon, pricer, theoretical_price) in enumerate(zip(self.horizons, self.pricers,
+                                                                     self.theoretical_prices)):
+            if k not in pnl:
+                pnl[k] = self._revalue(horizon, pricer, theoretical_price, market_states[horizon])
+        return [(pnl[k], scenario_sets[horizon][pricer.instrument.underlying])
+                for k, (horizon, pricer) in enumerate(zip(self.horizons, self.pricers))]
+
 
 class VaRMCEvaluator:
-    def __init__(self, calculation_date: str, number_sample: int, diffusion_path: int, threshold: float):
+    def __init__(self, calculation_date: str, number_sample: int, diffusion_path: int, threshold: float,
+                 cache_dir: str = None, chunk_size: int = None, seed: int = 1, n_workers: int = 1,
+                 variance_reduction: str = None, control_variate: bool = False, instrumentation=None,
+                 portfolio: bool = False, pnl_cube_path: str = None, pnl_cube_dtype: str = "float64",
+                 vectorized_pricing: bool = True, garch_backend: str = "arch", correlation_model: str = "sample",
+                 factors: int = None, pnl_approximation: str = None, approximation_tolerance: float = 0.05,
+                 interpolated_pricing: bool = False, interpolation_tolerance: float = 1e-6,
+                 scenario_generator: str = "monte_carlo", historical_window: int = 250):
+        if scenario_generator not in SCENARIO_GENERATORS:
+            raise ValueError(f"Générateur de scénarios inconnu : {scenario_generator}")
+        if scenario_generator != "monte_carlo" and control_variate:
+            raise ValueError("La variable de contrôle suppose une diffusion martingale "
+                             "(scenario_generator='monte_carlo')")
         self.calculation_date = calculation_date
         self.number_sample = number_sample
         self.diffusion_path = diffusion_path
         self.threshold = threshold
-
-        self.mc_diffusion = MCDiffusion(calculation_date, number_sample, diffusion_path)
+        self.chunk_size = chunk_size  # Taille des blocs de scénarios (None : un seul bloc)
+        self.control_variate = control_variate  # Correction par le forward du sous-jacent
+        self.portfolio = portfolio  # Conserve la matrice de PnL scénarios x transactions du book
+        self.pnl_cube_path = pnl_cube_path  # Persistance du cube de PnL (memory-map .npy + métadonnées JSON)
+        self.pnl_cube_dtype = pnl_cube_dtype
+        self.vectorized_pricing = vectorized_pricing  # Revalorisation du book par groupes (type, sous-jacent)
+        self.pnl_approximation = pnl_approximation  # None, 'delta' ou 'delta_gamma' (PnL par sensibilités)
+        self.approximation_tolerance = approximation_tolerance
+        # Pricers remplacés par leur interpolation de Chebyshev (y compris hors BookPricer), hors path-dependent
+        self.interpolated_pricing = interpolated_pricing
+        self.interpolation_tolerance = interpolation_tolerance
+
+        self.scenario_generator = scenario_generator
+        if scenario_generator == "monte_carlo":
+            self.mc_diffusion = MCDiffusion(calculation_date, number_sample, diffusion_path, cache_dir=cache_dir,
+                                            chunk_size=chunk_size, seed=seed, n_workers=n_workers,
+                                            variance_reduction=variance_reduction, garch_backend=garch_backend,
+                                            correlation_model=correlation_model, factors=factors)
+        else:
+            # Simulation historique : un scénario par fenêtre de l'historique
+            self.number_sample = historical_window
+            self.mc_diffusion = HistoricalSimulation(calculation_date, historical_window,
+                                                     filtered=scenario_generator == "filtered_historical",
+                                                     chunk_size=chunk_size, cache_dir=cache_dir,
+                                                     garch_backend=garch_backend, n_workers=n_workers)
         self.pricer_factory = PricerFactory()
+        # Instrumentation par étape (Instrumentation) ; NullInstrumentation : aucun coût
+        self.instrumentation = instrumentation or NullInstrumentation()
+        self.mc_diffusion.instrumentation = self.instrumentation
+
+    @staticmethod
+    def _stage_seconds(instrumentation, name: str) -> float:
+        """
+        Durée totale (wall) des étapes `name` mesurées jusqu'ici, toutes étiquettes confondues.
+        """
+        return sum(record["wall_seconds"] for record in instrumentation.summary()["stages"] if record["stage"] == name)
 
-        
-    def evaluate(self, deals: dict, market_data: dict, T_days: int):
+    def evaluate(self, deals: dict, market_data: dict, T_days):
         """
-        Évaluation de la VaR basée sur le PnL à un instant T spécifique.
+        Évaluation de la VaR basée sur le PnL à un ou plusieurs horizons T.
         1. Calcul du prix théorique aujourd'hui (date_spot)
         2. Simulation Monte Carlo des prix des actifs sous-jacents à T jours
         3. Simulation Monte Carlo des prix des dérivés basés sur ces simulations
         4. Calcul de la VaR basée sur le PnL à T jours
 
+        Les scénarios sont générés et consommés par blocs de `chunk_size` : diffusion,
+        revalorisation et agrégation du PnL se font bloc par bloc (voir StreamingPnL
+        pour le calcul exact du quantile sans conserver l'ensemble des scénarios).
+        Une seule diffusion jusqu'à l'horizon le plus long fournit les spots de tous
+        les horizons demandés, revalorisés dans la même passe.
+
+        Avec `control_variate`, les moyennes sont corrigées par le spot simulé du
+        sous-jacent, dont l'espérance exacte sous la diffusion est le forward S_0.
+        Les erreurs types de la VaR et de la moyenne sont jointes aux résultats.
+
+        Si une instrumentation est configurée, le temps écoulé, le temps CPU et le pic
+        d'allocation de chaque étape (calibration, génération aléatoire, corrélation
+        des chocs, diffusion, revalorisation par horizon - par transaction si
+        `vectorized_pricing` est désactivé -, agrégation, percentile)
+        sont attachés à `var_results.metrics` et envoyés aux sinks. L'étape "scenarios"
+        couvre la production complète de chaque bloc ; avec n_workers > 1, le détail des
+        étapes exécutées dans les workers n'est pas remonté.
+
+        Avec `portfolio`, le PnL de chaque scénario est aussi rangé dans une matrice
+        scénarios x transactions par horizon, signée et pondérée par position et notional
+        (mémoire n_scénarios x n_transactions). VaR / ES du book, VaR en composantes
+        (Euler), marginale et incrémentale en découlent (voir PortfolioPnL).
+
+        Avec `pnl_cube_path`, ces matrices sont écrites directement dans un cube
+        scénarios x transactions x horizons memory-mappé (float32 ou float64), relu
+        ensuite par PnLCube.open pour agréger n'importe quel sous-ensemble sans simulation.
+
+        Avec `scenario_generator` = 'historical' ou 'filtered_historical', les scénarios
+        ne sont pas simulés mais rejoués sur les `historical_window` fenêtres les plus
+        récentes de l'historique (voir HistoricalSimulation) ; le reste du calcul est inchangé.
+
+        Avec `pnl_approximation` ('delta' ou 'delta_gamma'), le PnL de chaque transaction
+        est approché par ses sensibilités analytiques à la date cible, sans revalorisation
+        des scénarios (voir SensitivityApproximation). Les transactions dont l'erreur aux
+        chocs de contrôle dépasse `approximation_tolerance`, et les options échues à
+        l'horizon, sont revalorisées complètement ; la méthode retenue est indiquée dans
+        les résultats ("Revalorisation (T=...)").
+
+        Avec `interpolated_pricing`, les pricers non approchés par sensibilités sont
+        remplacés, par transaction et date cible, par leur interpolation de Chebyshev sur
+        une grille de spots (voir InterpolatedPricer) si l'erreur estimée respecte
+        `interpolation_tolerance` ; cette erreur est jointe aux résultats ("Erreur
+        d'interpolation (T=...)"). La demande explicite prime sur `vectorized_pricing` :
+        les Call, Put et Future interpolés sont retirés du BookPricer. Les produits
+        path-dependent ne sont pas interpolés (prix fonction de la trajectoire, pas du
+        seul spot) et restent revalorisés complètement.
+
+        Les produits path-dependent (Asian, Barrier) déclarent les statistiques de
+        trajectoire dont dépend leur prix (Pricer.path_statistics) : la diffusion les met
+        à jour à chaque pas sans conserver les trajectoires (voir RunningStatistics), et
+        ces produits sont toujours revalorisés complètement.
+
         Paramètres :
         ------------
         - deals : dict -> Ensemble des transactions
         - market_data : dict -> Données de marché actuelles
-        - T_days : int -> Nombre de jours futurs pour évaluer le prix (doit être entre aujourd'hui et maturity)
+        - T_days : int | list -> Horizon(s) en jours pour évaluer le prix (entre aujourd'hui et maturity)
         """
 
-        var_results = {}
+        var_results = VaRResults()
+        instrumentation = self.instrumentation
+        instrumentation.reset()
+        revaluations = []  # [(deal_id, horizon, pricer à la date cible, prix théorique, agrégateur PnL, forward)]
+        horizons_by_deal = {}  # {deal_id: horizons retenus après vérification de la maturité}
+        clamped_horizons = {}  # {deal_id: {horizon demandé: horizon retenu}}
 
         self.calculation_date = pd.to_datetime(self.calculation_date)
+        market_data = MarketDataUniverse.of(market_data)  # Matrices prix / rendements alignées, construites une fois
 
         for deal_id, deal in deals.items():
-            # **1. Vérification de T_days**
-            max_T_days = (deal.maturity - self.calculation_date).days
-            if T_days < 0:
-                print(f"Erreur : T_days ({T_days}) ne peut pas être négatif. Fixé à 0.")
-                T_days = 0
-            if T_days > max_T_days:
-                print(f"Erreur : T_days ({T_days}) dépasse la maturité. Fixé à {max_T_days}.")
-                T_days = max_T_days
-
-            # **2. Calcul du prix théorique du dérivé aujourd'hui**
-            pricer = self.pricer_factory.create_pricer(self.calculation_date, deal)
-            # print("market_data: ", market_data)
-            theoretical_price = pricer.calculate(market_data)  # Prix calculé aujourd'hui
-
-            # **3. Simulation Monte Carlo des prix des actifs sous-jacents à T_days jours**
-            simulated_asset_prices = self.mc_diffusion.diffuse(market_data, T_days)[deal.underlying]
-            # print("🔍 Monte Carlo Simulated Prices: ", simulated_asset_prices)
-
-            # **4. Simulation Monte Carlo des prix des dérivés à T_days jours**
-            simulated_derivative_prices = []
-
-            target_date = (self.calculation_date + pd.Timedelta(days=T_days)).strftime('%m/%d/%Y')
-
-            for simulated_price in simulated_asset_prices:
-                simulated_market_data = {}
-
-                for asset, original_data in market_data.items():
-                    simulated_market_data[asset] = type(original_data)(
-                        name=original_data.name,
-                        data=original_data.data.copy()
-                    )
-
-                # **确保构造 `Equity` 或 `Rate` 对象**
-                if isinstance(market_data[deal.underlying], Equity):
-                    simulated_market_data[deal.underlying] = Equity(
-                        name=deal.underlying,
-                        data=pd.DataFrame({
-                            "Date": [target_date],
-                            "Price": [simulated_price]
-                        })
-                    )
-                elif isinstance(market_data[deal.underlying], Rate):
-                    simulated_market_data[deal.underlying] = Rate(
-                        name=deal.underlying,
-                        data=pd.DataFrame({
-                            "Date": [target_date],
-                            "Price": [simulated_price]
-                        })
-                    )
-                else:
-                    raise ValueError(f" Type de marché inconnu pour {deal.underlying}")
-
-
-                simulated_market_data[deal.underlying].data["Date"] = pd.to_datetime(
-                    simulated_market_data[deal.underlying].data["Date"], format="%m/%d/%Y"
-                )
-
-                future_pricer = self.pricer_factory.create_pricer(target_date, deal)
-
-                simulated_price_derivative = future_pricer.calculate(simulated_market_data)
-                simulated_derivative_prices.append(simulated_price_derivative)
-
-            # **5. Calcul du PnL et de la VaR basée sur le PnL à T_days jours**
-            pnl = np.array(simulated_derivative_prices) - theoretical_price  # Calcul du PnL
-            var_value = np.percentile(pnl, (1 - self.threshold) * 100)  # Calcul de la VaR
-            perte_moyenne = np.mean(pnl)  # Moyenne des pertes sur T jours
-
-            var_results[deal_id] = {
-                "Prix du Pricer": round(theoretical_price, 4),
-                f"Moyenne simulée MC (T={T_days})": round(np.mean(simulated_derivative_prices), 4),  
-                f"VaR (PnL, T={T_days})": round(var_value, 4),
-                "Perte moyenne": round(perte_moyenne, 4) 
-            }
+            with instrumentation.stage("pricing_today", deal_id=deal_id):
+                # **1. Vérification des horizons T_days**
+                max_T_days = (deal.maturity - self.calculation_date).days
+                deal_horizons = set()
+                clamped_horizons[deal_id] = {}
+                for requested in as_horizons(T_days):
+                    horizon = requested
+                    if horizon < 0:
+                        print(f"Erreur : T_days ({horizon}) ne peut pas être négatif. Fixé à 0.")
+                        horizon = 0
+                    if horizon > max_T_days:
+                        print(f"Erreur : T_days ({horizon}) dépasse la maturité. Fixé à {max_T_days}.")
+                        horizon = max_T_days
+                    deal_horizons.add(horizon)
+                    clamped_horizons[deal_id][requested] = horizon
+                horizons_by_deal[deal_id] = sorted(deal_horizons)
+
+                # **2. Calcul du prix théorique du dérivé aujourd'hui**
+                pricer = self.pricer_factory.create_pricer(self.calculation_date, deal)
+                # print("market_data: ", market_data)
+                theoretical_price = pricer.calculate(market_data)  # Prix calculé aujourd'hui
+                var_results[deal_id] = {"Prix du Pricer": round(theoretical_price, 4)}
+
+                # Forward de l'actif sous-jacent (martingale sous la diffusion) : espérance de la variable de contrôle
+                forward = market_data[deal.underlying].get_by_date(self.calculation_date) if self.control_variate else None
+                for horizon in horizons_by_deal[deal_id]:
+                    target_date = (self.calculation_date + pd.Timedelta(days=horizon)).strftime('%m/%d/%Y')
+                    future_pricer = self.pricer_factory.create_pricer(target_date, deal)
+                    accumulator = StreamingPnL(self.number_sample, 1 - self.threshold)
+                    revaluations.append((deal_id, horizon, future_pricer, theoretical_price, accumulator, forward))
+
+        # **3. Simulation Monte Carlo des sous-jacents et 4. revalorisation des dérivés, bloc par bloc**
+        # Un seul jeu de scénarios, diffusé une fois jusqu'à l'horizon le plus long et partagé par
+        # toutes les transactions ; les blocs peuvent être traités en parallèle, l'agrégation se
+        # fait dans l'ordre des blocs
+        _, horizons, pricers, theoretical_prices, accumulators, _ = zip(*revaluations)
+
+        # Approximation par sensibilités : retenue transaction par transaction si l'erreur est bornée
+        approximations = {}
+        if self.pnl_approximation:
+            for k, (deal_id, horizon, future_pricer, theoretical_price, *_) in enumerate(revaluations):
+                if future_pricer.path_statistics():
+                    # Produit path-dependent : le PnL ne se résume pas à la variation du spot
+                    var_results[deal_id][f"Revalorisation (T={horizon})"] = "complète"
+                    continue
+                with instrumentation.stage("sensitivities", deal_id=deal_id, horizon=horizon):
+                    underlying = deals[deal_id].underlying
+                    approximation = SensitivityApproximation(
+                        future_pricer, theoretical_price, market_data[underlying].get_by_date(self.calculation_date),
+                        market_data.asset_returns(underlying).std(), horizon, self.pnl_approximation,
+                        self.approximation_tolerance)
+                if approximation.accepted:
+                    approximations[k] = approximation
+                var_results[deal_id][f"Revalorisation (T={horizon})"] = (
+                    self.pnl_approximation if approximation.accepted else "complète")
+            instrumentation.count("approximated_revaluations", len(approximations))
+
+        # Interpolation des pricers, sur une grille couvrant les scénarios à l'horizon
+        pricers = list(pricers)
+        if self.interpolated_pricing:
+            for k, (deal_id, horizon, future_pricer, *_) in enumerate(revaluations):
+                deal = deals[deal_id]
+                if k in approximations or future_pricer.path_statistics():
+                    continue
+                with instrumentation.stage("interpolation_grid", deal_id=deal_id, horizon=horizon):
+                    interpolated = InterpolatedPricer.around_spot(
+                        future_pricer, market_data[deal.underlying].get_by_date(self.calculation_date),
+                        market_data.asset_returns(deal.underlying).std(), horizon,
+                        tolerance=self.interpolation_tolerance)
+                if interpolated.accepted:
+                    pricers[k] = interpolated
+                    var_results[deal_id][f"Erreur d'interpolation (T={horizon})"] = interpolated.error
+                    instrumentation.count("interpolated_revaluations")
+
+        in_process = self.mc_diffusion.n_workers <= 1
+        revaluation = ChunkRevaluation(market_data, list(horizons), pricers, list(theoretical_prices),
+                                       instrumentation if in_process else None, self.vectorized_pricing,
+                                       approximations)
+
+        # Matrices de PnL du book : pour chaque horizon demandé, colonne de chaque transaction
+        # alimentée par sa revalorisation à l'horizon retenu, pondérée par position x notional
+        pnl_matrices, matrix_targets = {}, [[] for _ in revaluations]
+        if self.portfolio or self.pnl_cube_path:
+            deal_ids = list(deals)
+            if self.pnl_cube_path:
+                var_results.pnl_cube = PnLCube.create(
+                    self.pnl_cube_path, self.number_sample, deal_ids, as_horizons(T_days), self.pnl_cube_dtype,
+                    calculation_date=self.calculation_date.isoformat(), threshold=self.threshold,
+                    scenario_generator=self.scenario_generator,
+                    seed=self.mc_diffusion.seed, chunk_size=self.mc_diffusion.chunk_size,
+                    variance_reduction=self.mc_diffusion.variance_reduction,
+                    target_dates={h: (self.calculation_date + pd.Timedelta(days=h)).isoformat()
+                                  for h in as_horizons(T_days)},
+                    deals={deal_id: {"type": deal.get_class_name(), "underlying": deal.underlying,
+                                     "currency": deal.currency, "position": deal.position,
+                                     "notional": deal.notional} for deal_id, deal in deals.items()})
+            for requested in as_horizons(T_days):
+                pnl_matrices[requested] = (var_results.pnl_cube.horizon_view(requested) if var_results.pnl_cube
+                                           else np.empty((self.number_sample, len(deal_ids))))
+            index = {(deal_id, horizon): k for k, (deal_id, horizon, *_) in enumerate(revaluations)}
+            for column, deal_id in enumerate(deal_ids):
+                for requested, horizon in clamped_horizons[deal_id].items():
+                    matrix_targets[index[(deal_id, horizon)]].append(
+                        (pnl_matrices[requested], column, position_weight(deals[deal_id])))
+
+        offset, first_chunk_seconds = 0, None
+        # Statistiques de trajectoire des produits path-dependent, tenues pendant la diffusion
+        path_statistics = tuple(dict.fromkeys(statistic for pricer in pricers
+                                              for statistic in pricer.path_statistics()))
+        scenarios = iter(self.mc_diffusion.map_scenarios(market_data, horizons, revaluation, path_statistics))
+        while True:
+            with instrumentation.stage("scenarios"):
+                pnl_chunk = next(scenarios, None)
+            if first_chunk_seconds is None and instrumentation.enabled:
+                first_chunk_seconds = self._stage_seconds(instrumentation, "scenarios")
+            if pnl_chunk is None:
+                break
+            with instrumentation.stage("aggregation"):
+                size = len(pnl_chunk[0][0])
+                for accumulator, targets, (pnl, control) in zip(accumulators, matrix_targets, pnl_chunk):
+                    accumulator.update(pnl, control)
+                    for matrix, column, weight in targets:
+                        matrix[offset:offset + size, column] = weight * pnl
+                offset += size
+            instrumentation.count("scenarios_priced", size * len(pnl_chunk))
+
+        # **5. Calcul de la VaR basée sur le PnL à chaque horizon**
+        for deal_id, horizon, future_pricer, theoretical_price, accumulator, forward in revaluations:
+            with instrumentation.stage("percentile", deal_id=deal_id, horizon=horizon):
+                var_value = accumulator.value_at_risk()  # Calcul de la VaR
+                perte_moyenne = accumulator.mean(forward)  # Moyenne des pertes sur T jours
+
+                var_results[deal_id].update({
+                    f"Moyenne simulée MC (T={horizon})": round(theoretical_price + perte_moyenne, 4),
+                    f"VaR (PnL, T={horizon})": round(var_value, 4),
+                    f"Perte moyenne (T={horizon})": round(perte_moyenne, 4),
+                    f"Erreur type VaR (T={horizon})": round(accumulator.var_standard_error(), 4),
+                    f"Erreur type moyenne (T={horizon})": round(accumulator.mean_standard_error(forward), 4)
+                })
+
+        if var_results.pnl_cube is not None:
+            var_results.pnl_cube.flush()
+
+        if self.portfolio:
+            with instrumentation.stage("portfolio"):
+                var_results.portfolio = {requested: PortfolioPnL(matrix, deal_ids, deals, self.threshold)
+                                         for requested, matrix in pnl_matrices.items()}
 
         # **6. Affichage des résultats**
         print("\n=== Résultats du calcul de la VaR (PnL) à T = {} jours ===".format(T_days))
         for deal_id, result in var_results.items():
             print(f"- Transaction {deal_id}")
             print(f"   - Prix calculé par le Pricer : {result['Prix du Pricer']}")
-            print(f"   - Moyenne des simulations MC (T={T_days}) : {result[f'Moyenne simulée MC (T={T_days})']}")
-            print(f"   - VaR (PnL, T={T_days}, 99%) : {result[f'VaR (PnL, T={T_days})']}")
-            print(f"   - Perte moyenne : {result['Perte moyenne']}")
+            for horizon in horizons_by_deal[deal_id]:
+                print(f"   - Moyenne des simulations MC (T={horizon}) : {result[f'Moyenne simulée MC (T={horizon})']}")
+                print(f"   - VaR (PnL, T={horizon}, {self.threshold:.0%}) : {result[f'VaR (PnL, T={horizon})']}")
+                print(f"   - Perte moyenne (T={horizon}) : {result[f'Perte moyenne (T={horizon})']}")
+                print(f"   - Erreur type VaR / moyenne (T={horizon}) : {result[f'Erreur type VaR (T={horizon})']}"
+                      f" / {result[f'Erreur type moyenne (T={horizon})']}")
+                if f"Revalorisation (T={horizon})" in result:
+                    print(f"   - Revalorisation (T={horizon}) : {result[f'Revalorisation (T={horizon})']}")
+                interpolation_error = result.get(f"Erreur d'interpolation (T={horizon})")
+                if interpolation_error is not None:
+                    print(f"   - Erreur d'interpolation (T={horizon}) : {interpolation_error:.2e}")
             print("----------------------------")
 
-        return var_results  # Retourne les résultats de la VaR (PnL)
-
-
-
-
-
-
-
+        for requested, book in (var_results.portfolio or {}).items():
+            components = book.component_var()
+            print(f"=== Portefeuille (T={requested}) ===")
+            print(f"   - VaR (PnL, {self.threshold:.0%}) : {round(book.value_at_risk(), 4)}")
+            print(f"   - ES (PnL, {self.threshold:.0%}) : {round(book.expected_shortfall(), 4)}")
+            for deal_id, component in components.items():
+                print(f"   - VaR en composante {deal_id} : {round(component, 4)}")
+            print("----------------------------")
 
+        if instrumentation.enabled:
+            # La calibration, déclenchée par le premier bloc (générateur paresseux), est mesurée
+            # dans l'étape "scenarios" de ce bloc : elle est exclue du débit. Si elle dépasse la
+            # durée du premier bloc, elle s'est déroulée hors de l'étape et n'est pas retranchée
+            scenarios_seconds = self._stage_seconds(instrumentation, "scenarios")
+            calibration_seconds = self._stage_seconds(instrumentation, "calibration")
+            if calibration_seconds <= first_chunk_seconds:
+                scenarios_seconds -= calibration_seconds
+            if scenarios_seconds > 0:
+                instrumentation.count("scenarios_per_second",
+                                      instrumentation.counters["scenarios_priced"] / scenarios_seconds)
+        var_results.metrics = instrumentation.flush()
 
+        return var_results  # Retourne les résultats de la VaR (PnL)
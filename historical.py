@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: babacardiallo
+"""
+import numpy as np
+import pandas as pd
+
+from garch import conditional_volatility
+from instrumentation import NullInstrumentation
+from MarketData.universe import MarketDataUniverse
+from mc_diffusion import MCDiffusion, as_horizons
+from path_statistics import RunningStatistics
+from scenario import ScenarioSet
+
+# Générateurs de scénarios disponibles pour VaRMCEvaluator
+SCENARIO_GENERATORS = ("monte_carlo", "historical", "filtered_historical")
+
+
+class HistoricalSimulation:
+    """
+    Générateur de scénarios historiques, substituable à MCDiffusion dans VaRMCEvaluator
+    (mêmes méthodes iter_scenarios / map_scenarios, mêmes {horizon: ScenarioSet}).
+
+    Le scénario i rejoue la fenêtre de marché commençant à la date t_i : les
+    `number_samples` fenêtres les plus récentes de longueur max(horizons) de
+    l'historique antérieur à la date de calcul, le spot à l'horizon h valant
+    S_0 exp(R_i(h)), avec R_i(h) le rendement log cumulé sur les h premiers jours
+    de la fenêtre (fenêtres glissantes chevauchantes, scénarios communs aux horizons).
+    Aucun tirage aléatoire : tout est obtenu par opérations vectorisées sur la
+    matrice des prix alignés.
+
+    - "historical" : R_i(h) = log P(t_i + h) - log P(t_i), rendements observés.
+    - "filtered_historical" (FHS) : les rendements sont filtrés par le GARCH(1,1)
+      calibré à la date de calcul, z_t = (r_t - mu) / sigma_t, puis remis à l'échelle
+      de la volatilité prévue : R_i(h) = sum_{k<h} (mu + sigma_{k+1} z_{t_i + k}).
+      La calibration (moteur, cache disque) est celle de MCDiffusion.
+
+    Les statistiques de trajectoire (produits path-dependent) sont tenues sur les
+    jours successifs de chaque fenêtre, comme les pas de la diffusion.
+
+    Paramètres :
+    ------------
+    - date : str -> Date de calcul (seul l'historique jusqu'à cette date est utilisé)
+    - number_samples : int -> Nombre de scénarios (fenêtres historiques)
+    - filtered : bool -> Simulation historique filtrée par GARCH
+    - chunk_size : int -> Taille des blocs transmis au consommateur (None : un seul bloc)
+    - cache_dir, garch_backend, n_workers : -> Calibration GARCH (voir MCDiffusion)
+    """
+
+    # Pas de tirage aléatoire : consommation des blocs dans le processus principal
+    seed = None
+    variance_reduction = None
+    n_workers = 1
+
+    def __init__(self, date, number_samples: int, filtered: bool = False, chunk_size: int = None,
+                 cache_dir: str = None, garch_backend: str = "arch", n_workers: int = 1):
+        self.date = date
+        self.number_samples = number_samples
+        self.filtered = filtered
+        self.chunk_size = chunk_size or number_samples
+        self.volatility_model = MCDiffusion(date, number_samples, 1, cache_dir=cache_dir,
+                                            garch_backend=garch_backend, n_workers=n_workers)
+        self.instrumentation = NullInstrumentation()
+
+    def log_returns(self, market_data: dict, horizons: tuple) -> dict:
+        """
+        Rendements log cumulés des scénarios : {horizon: (number_samples, actifs)}.
+        """
+        cumulative = self.cumulative_returns(market_data, max(horizons))
+        return {horizon: cumulative[:, :, horizon - 1] if horizon else np.zeros(cumulative.shape[:2])
+                for horizon in horizons}
+
+    def cumulative_returns(self, market_data: dict, window: int) -> np.ndarray:
+        """
+        Rendements log cumulés jour par jour sur chaque fenêtre : (number_samples, actifs, window).
+        """
+        full_history = MarketDataUniverse.of(market_data)
+        universe = full_history.until(pd.Timestamp(self.date))
+        available = len(universe.returns) - window + 1
+        if available < self.number_samples:
+            raise ValueError(f"Historique insuffisant : {available} fenêtres de {window} jours "
+                             f"pour {self.number_samples} scénarios")
+        # Dates de début des fenêtres (indices dans les prix), les plus récentes
+        starts = np.arange(available - self.number_samples, available)
+
+        if not self.filtered:
+            log_prices = np.log(universe.prices)
+            steps = starts[:, None] + np.arange(1, window + 1)
+            return (log_prices[steps] - log_prices[starts][:, None]).transpose(0, 2, 1)
+
+        self.volatility_model.instrumentation = self.instrumentation
+        self.volatility_model.date = self.date
+        if len(universe.dates) == len(full_history.dates):
+            vol_estimation, _, _ = self.volatility_model.calibrate(universe, window)
+        else:
+            # La clé du cache porte sur les séries complètes : pas de cache pour un historique tronqué
+            with self.instrumentation.stage("calibration"):
+                vol_estimation = self.volatility_model.volatility_estimation(universe, window)
+        params = np.array([self.volatility_model.garch_params[asset] for asset in universe.assets])
+        forecast = np.array([vol_estimation[asset] for asset in universe.assets])  # (actifs, window)
+        mu = params[:, 0]
+        standardized = (universe.returns - mu) / conditional_volatility(universe.returns, params)
+
+        # Fenêtres glissantes (number_samples, actifs, window) de résidus remis à l'échelle de la prévision
+        windows = np.lib.stride_tricks.sliding_window_view(standardized, window, axis=0)[starts]
+        return np.cumsum(mu[:, None] + forecast * windows, axis=2)
+
+    def iter_scenarios(self, market_data: dict, T_days, path_statistics: tuple = ()):
+        """
+        Scénarios par blocs de `chunk_size` : {horizon: ScenarioSet} par bloc, comme MCDiffusion.
+        """
+        horizons = as_horizons(T_days)
+        universe = MarketDataUniverse.of(market_data)
+        with self.instrumentation.stage("historical_windows"):
+            cumulative = self.cumulative_returns(universe, max(horizons))
+            spots_today = np.array([universe[asset].get_by_date(self.date) for asset in universe.assets])
+
+        for start in range(0, self.number_samples, self.chunk_size):
+            paths = spots_today[:, None] * np.exp(cumulative[start:start + self.chunk_size])
+            statistics = RunningStatistics(path_statistics, universe.assets, self.date, len(paths))
+            scenario_sets = {}
+            for step in range(max(horizons) + 1):
+                spots = paths[:, :, step - 1] if step else np.tile(spots_today, (len(paths), 1))
+                if step and path_statistics:
+                    statistics.update(step, spots)
+                if step in horizons:
+                    scenario_sets[step] = ScenarioSet(
+                        date=pd.Timestamp(self.date), horizon=step,
+                        spots={asset: spots[:, j] for j, asset in enumerate(universe.assets)},
+                        path_statistics=statistics.snapshot())
+            yield scenario_sets
+
+    def map_scenarios(self, market_data: dict, T_days, consumer, path_statistics: tuple = ()):
+        for scenario_sets in self.iter_scenarios(market_data, T_days, path_statistics):
+            yield consumer(scenario_sets)
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: babacardiallo
+"""
+import json
+import logging
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+class LoggingSink:
+    """
+    Emet le résumé d'instrumentation sous forme de log structuré (une ligne JSON par étape).
+    """
+
+    def __init__(self, logger: logging.Logger = None, level: int = logging.INFO):
+        self.logger = logger or logging.getLogger("var.instrumentation")
+        self.level = level
+
+    def emit(self, summary: dict):
+        for record in summary["stages"]:
+            self.logger.log(self.level, json.dumps(record))
+        self.logger.log(self.level, json.dumps({"counters": summary["counters"]}))
+
+
+class JsonFileSink:
+    """
+    Ecrit le résumé d'instrumentation dans un fichier JSON.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def emit(self, summary: dict):
+        with open(self.path, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+class CallbackSink:
+    """
+    Transmet le résumé d'instrumentation à une fonction utilisateur.
+    """
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def emit(self, summary: dict):
+        self.callback(summary)
+
+
+class Instrumentation:
+    """
+    Mesure par étape (et par transaction via les tags) du temps écoulé, du temps CPU
+    et du pic d'allocation mémoire (tracemalloc, si `track_memory`), ainsi que des
+    compteurs (ex. scénarios valorisés). Les mesures d'une même étape et de mêmes
+    tags sont cumulées (ex. une étape répétée sur chaque bloc de scénarios).
+
+    Paramètres :
+    ------------
+    - sinks : list -> Destinations du résumé (LoggingSink, JsonFileSink, CallbackSink)
+    - track_memory : bool -> Active le suivi des allocations (coût non négligeable)
+    """
+
+    enabled = True
+
+    def __init__(self, sinks: list = (), track_memory: bool = False):
+        self.sinks = list(sinks)
+        self.track_memory = track_memory
+        self.reset()
+
+    def reset(self):
+        self.stages = {}
+        self.counters = {}
+        self._memory_stack = []
+
+    @contextmanager
+    def stage(self, name: str, **tags):
+        if self.track_memory:
+            self._enter_memory()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            peak = self._exit_memory() if self.track_memory else None
+            self._record(name, tags, wall, cpu, peak)
+
+    def count(self, name: str, value: float = 1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def _enter_memory(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        current, peak = tracemalloc.get_traced_memory()
+        if self._memory_stack:
+            self._memory_stack[-1]["peak"] = max(self._memory_stack[-1]["peak"], peak)
+        tracemalloc.reset_peak()
+        self._memory_stack.append({"start": current, "peak": current})
+
+    def _exit_memory(self) -> int:
+        _, peak = tracemalloc.get_traced_memory()
+        entry = self._memory_stack.pop()
+        entry["peak"] = max(entry["peak"], peak)
+        if self._memory_stack:
+            self._memory_stack[-1]["peak"] = max(self._memory_stack[-1]["peak"], entry["peak"])
+        return entry["peak"] - entry["start"]
+
+    def _record(self, name: str, tags: dict, wall: float, cpu: float, peak: int):
+        key = (name, tuple(sorted(tags.items())))
+        record = self.stages.setdefault(key, {"stage": name, **tags, "calls": 0, "wall_seconds": 0.0,
+                                              "cpu_seconds": 0.0, "peak_bytes": None})
+        record["calls"] += 1
+        record["wall_seconds"] += wall
+        record["cpu_seconds"] += cpu
+        if peak is not None:
+            record["peak_bytes"] = max(record["peak_bytes"] or 0, peak)
+
+    def summary(self) -> dict:
+        return {"stages": list(self.stages.values()), "counters": dict(self.counters)}
+
+    def flush(self) -> dict:
+        """
+        Envoie le résumé à toutes les destinations et le retourne.
+        """
+        summary = self.summary()
+        for sink in self.sinks:
+            sink.emit(summary)
+        return summary
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class NullInstrumentation:
+    """
+    Instrumentation désactivée : mêmes méthodes, aucune mesure ni allocation.
+    """
+
+    enabled = False
+    _null_stage = _NullStage()
+
+    def reset(self):
+        pass
+
+    def stage(self, name: str, **tags):
+        return self._null_stage
+
+    def count(self, name: str, value: float = 1):
+        pass
+
+    def summary(self):
+        return None
+
+    def flush(self):
+        return None
@@ -3,34 +3,70 @@
 """
 @author: Babacar Diallo
 """
-import xml.etree.ElementTree as ET
-from preprocessing import DealPreprocessing, MarketDataPreprocessing
+from MarketData.store import MarketDataStore
+from Deal.dealbook import load_deal_book
 from evaluator import VaRMCEvaluator
+from instrumentation import Instrumentation, JsonFileSink
 
 path = './Inputs'
 nb_sample = 10000
 nb_diffusion_path = 1
 date_spot = '03/15/2024'
-T_days = 10 # Calcul de la VaR basée sur le PnL à T jours
+T_days = [1, 10, 30] # Horizons (jours) de la VaR basée sur le PnL, calculés en une seule passe
+deal_book_cache = './Cache/deals.npz' # Book de transactions compilé, reconstruit si un XML change
+market_data_cache = './Cache/marketdata' # Séries de marché converties une fois en binaire (dates int64 + prix)
+calibration_cache = './Cache/calibration' # Cache disque des calibrations GARCH / corrélation
+chunk_size = 5000 # Taille des blocs de scénarios : borne la mémoire de la diffusion
+n_workers = 1 # Nombre de processus pour la diffusion / revalorisation des blocs
+garch_backend = 'arch' # 'arch' (un ajustement par actif) ou 'batched' (tous les actifs ensemble)
+correlation_model = 'sample' # 'sample', 'ledoit_wolf' ou 'factor' (ACP, voir factors)
+factors = None # Nombre de facteurs du modèle 'factor' (None : min(10, nombre d'actifs))
+# 'monte_carlo', 'historical' ou 'filtered_historical' (rendements filtrés par GARCH)
+scenario_generator = 'monte_carlo'
+historical_window = 200 # Nombre de scénarios (fenêtres de l'historique) des simulations historiques
+variance_reduction = None # None, 'antithetic' ou 'sobol' (pont brownien)
+control_variate = False # Correction des moyennes par le forward du sous-jacent
+portfolio = True # VaR / ES du book et VaR en composantes à partir de la matrice de PnL
+metrics_path = None # Fichier JSON de l'instrumentation par étape (None : désactivée)
+pnl_approximation = None # None (revalorisation complète), 'delta' ou 'delta_gamma' (PnL par sensibilités)
+approximation_tolerance = 0.05 # Erreur relative tolérée aux chocs de contrôle avant revalorisation complète
+interpolated_pricing = False # Pricers (hors path-dependent) interpolés en spot par Chebyshev, retirés du BookPricer
+interpolation_tolerance = 1e-6 # Erreur relative maximale de l'interpolation (sinon pricer exact)
+pnl_cube_path = None # Cube de PnL scénarios x transactions x horizons (.npy memory-mappé, None : désactivé)
 
 
-def main():
-    list_deals = ['deal1.xml', 'deal2.xml', 'deal3.xml']
-    deals_collection = {}
-    for file in list_deals:
-        tree = ET.parse(path+'/Deals/'+file)
-        deal_pp = DealPreprocessing(tree.getroot())
-        deal = deal_pp.build()
-        deals_collection[deal.deal_id] = deal
+def load_deals() -> dict:
+    deal_book = load_deal_book(path + '/Deals', cache_path=deal_book_cache, n_workers=n_workers)
+    return deal_book.to_deals()
+
 
+def load_market_data() -> dict:
     list_md = ['CAC40', 'FR6MBond', 'TTEF']
-    mk_data_collection = {}
-    for md in list_md:
-        mk_data_pp = MarketDataPreprocessing(path + '/MarketData/' + '{}.csv'.format(md))
-        mk_data = mk_data_pp.build(md)
-        mk_data_collection[md] = mk_data
+    market_data_store = MarketDataStore(market_data_cache)
+    market_data_store.sync({md: path + '/MarketData/' + '{}.csv'.format(md) for md in list_md})
+    return market_data_store.load(list_md)
+
+
+def build_evaluator(instrumentation=None) -> VaRMCEvaluator:
+    return VaRMCEvaluator(date_spot, nb_sample, nb_diffusion_path, threshold=0.99,
+                          cache_dir=calibration_cache, chunk_size=chunk_size,
+                          n_workers=n_workers, variance_reduction=variance_reduction,
+                          control_variate=control_variate, instrumentation=instrumentation,
+                          portfolio=portfolio, pnl_cube_path=pnl_cube_path,
+                          garch_backend=garch_backend, correlation_model=correlation_model,
+                          factors=factors, pnl_approximation=pnl_approximation,
+                          approximation_tolerance=approximation_tolerance,
+                          interpolated_pricing=interpolated_pricing,
+                          interpolation_tolerance=interpolation_tolerance,
+                          scenario_generator=scenario_generator, historical_window=historical_window)
+
+
+def main():
+    deals_collection = load_deals()
+    mk_data_collection = load_market_data()
 
-    var_evaluator = VaRMCEvaluator(date_spot, nb_sample, nb_diffusion_path, threshold=0.99)
+    instrumentation = Instrumentation([JsonFileSink(metrics_path)]) if metrics_path else None
+    var_evaluator = build_evaluator(instrumentation)
     var_evaluator.evaluate(deals_collection, mk_data_collection, T_days)
     test = 1
 
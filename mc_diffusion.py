@@ -1,14 +1,148 @@
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 import pandas as pd
-from arch import arch_model
+import arch
+from scipy.stats import norm, qmc
+
+from calibration_cache import CalibrationCache
+from correlation import CORRELATION_MODELS, CholeskyMixing, FactorMixing, ledoit_wolf_correlation, mixing_from_arrays
+from garch import RETURN_SCALE, _fit_arch, fit_universe
+from instrumentation import NullInstrumentation
+from MarketData.universe import MarketDataUniverse
+from path_statistics import RunningStatistics
+from scenario import ScenarioSet
+
+# Spécification du modèle de calibration, incluse dans la clé du cache disque
+MODEL_SPEC = f"GARCH(1,1)|mean=Constant|dist=normal|scale={RETURN_SCALE:g}|arch={arch.__version__}"
+
+# Moteurs de calibration GARCH : ajustement arch actif par actif, ou ajustement groupé (garch.BatchedGARCH)
+GARCH_BACKENDS = ("arch", "batched")
+
+# Modes de réduction de variance disponibles pour la génération des chocs
+VARIANCE_REDUCTION_MODES = (None, "antithetic", "sobol")
+
+# Nombre maximal de dimensions d'un point de Sobol (T_days x chocs), limite de scipy.stats.qmc.Sobol
+SOBOL_MAX_DIMENSIONS = 21201
+
+# Etat partagé d'un processus worker, initialisé une seule fois par _init_worker
+_WORKER_STATE = {}
+
+
+def as_horizons(T_days) -> tuple:
+    """
+    Normalise un horizon ou une liste d'horizons en tuple trié sans doublon.
+    """
+    return tuple(sorted({int(horizon) for horizon in np.atleast_1d(T_days)}))
+
+
+def _init_worker(diffusion, market_data, vol_estimation, mixing, horizons, consumer, path_statistics):
+    _WORKER_STATE.update(diffusion=diffusion, market_data=market_data, vol_estimation=vol_estimation,
+                         mixing=mixing, horizons=horizons, consumer=consumer, path_statistics=path_statistics)
+
+
+def brownian_bridge_order(T_days: int):
+    """
+    Plan de construction d'un pont brownien sur les dates 1..T_days (W_0 = 0) :
+    liste de (date cible, date gauche, date droite, poids gauche, poids droit, écart-type).
+    W_T est construit en premier, puis les points milieux récursivement, de sorte que
+    les premières dimensions (les mieux réparties en Sobol) portent la structure
+    grossière de la trajectoire.
+    """
+    plan = [(T_days, 0, None, 0.0, 0.0, np.sqrt(T_days))]
+    intervals = [(0, T_days)]
+    while intervals:
+        left, right = intervals.pop(0)
+        if right - left < 2:
+            continue
+        middle = (left + right) // 2
+        length = right - left
+        plan.append((middle, left, right, (right - middle) / length, (middle - left) / length,
+                     np.sqrt((middle - left) * (right - middle) / length)))
+        intervals += [(left, middle), (middle, right)]
+    return plan
+
+
+def brownian_bridge_increments(normals: np.ndarray) -> np.ndarray:
+    """
+    Transforme des normales (samples, T_days, actifs), ordonnées selon le pont brownien,
+    en incréments journaliers N(0, 1) indépendants de forme (samples, actifs, T_days).
+    """
+    number_samples, T_days, numb_variable = normals.shape
+    W = np.zeros((number_samples, T_days + 1, numb_variable))
+    for k, (target, left, right, w_left, w_right, std) in enumerate(brownian_bridge_order(T_days)):
+        W[:, target] = std * normals[:, k]
+        if right is not None:
+            W[:, target] += w_left * W[:, left] + w_right * W[:, right]
+    return np.diff(W, axis=1).transpose(0, 2, 1)
+
+
+def _run_chunk(chunk_index: int, size: int):
+    state = _WORKER_STATE
+    scenario_sets = state["diffusion"].scenario_chunk(state["market_data"], state["vol_estimation"], state["mixing"],
+                                                      state["horizons"], chunk_index, size, state["path_statistics"])
+    return state["consumer"](scenario_sets)
 
-np.random.seed(1)
 
 class MCDiffusion:
-    def __init__(self, date, number_samples, number_paths):
+    """
+    Diffusion Monte Carlo GBM-GARCH des facteurs de risque.
+
+    Les scénarios sont découpés en blocs de `chunk_size` tirages ; le bloc i utilise
+    son propre générateur, issu de SeedSequence(seed).spawn (spawn_key=(i,)).
+    Les résultats sont ainsi identiques bit à bit quel que soit le nombre de
+    workers (`n_workers`) ou l'ordre d'exécution des blocs.
+
+    Réduction de variance (`variance_reduction`) :
+    - None : tirages pseudo-aléatoires gaussiens, pas de temps par pas de temps.
+    - "antithetic" : paires (z, -z) au sein de chaque bloc et de chaque pas (chunk_size pair conseillé).
+    - "sobol" : suite de Sobol brouillée (une seule suite pour tous les blocs,
+      avancée par fast_forward), pont brownien sur les T_days pas de temps. Chaque point
+      couvre toute la trajectoire : les chocs du bloc (chunk_size x chocs x T_days) sont
+      tirés d'un coup, avec T_days x chocs <= SOBOL_MAX_DIMENSIONS.
+
+    Calibration GARCH (`garch_backend`) :
+    - "arch" : un ajustement arch par actif (garch._fit_arch, rendements mis à l'échelle RETURN_SCALE
+      comme l'ajustement groupé ; mêmes paramètres à l'échelle d'origine dans `garch_params`).
+    - "batched" : tous les actifs ajustés ensemble (garch.BatchedGARCH), à partir des
+      paramètres de l'appel précédent (`garch_params`) ; les actifs non convergés sont
+      ré-ajustés avec arch sur `n_workers` processus.
+
+    Corrélation des chocs (`correlation_model`, voir correlation.py) :
+    - "sample" : corrélation empirique et Cholesky (réparée si non définie positive).
+    - "ledoit_wolf" : corrélation rétrécie vers l'identité et Cholesky.
+    - "factor" : ACP à `factors` facteurs, coût O(N k) par tirage au lieu de O(N²).
+    """
+
+    def __init__(self, date, number_samples, number_paths, cache_dir: str = None,
+                 chunk_size: int = None, seed: int = 1, n_workers: int = 1, variance_reduction: str = None,
+                 garch_backend: str = "arch", correlation_model: str = "sample", factors: int = None):
+        if variance_reduction not in VARIANCE_REDUCTION_MODES:
+            raise ValueError(f"Réduction de variance inconnue : {variance_reduction}")
+        if garch_backend not in GARCH_BACKENDS:
+            raise ValueError(f"Moteur de calibration GARCH inconnu : {garch_backend}")
+        if correlation_model not in CORRELATION_MODELS:
+            raise ValueError(f"Modèle de corrélation inconnu : {correlation_model}")
         self.date = date
         self.number_samples = number_samples
         self.number_paths = number_paths
+        self.cache = CalibrationCache(cache_dir) if cache_dir else None
+        self.chunk_size = chunk_size or number_samples
+        self.seed = seed
+        self.n_workers = n_workers
+        self.variance_reduction = variance_reduction
+        self.garch_backend = garch_backend
+        self.correlation_model = correlation_model
+        self.factors = factors  # Nombre de facteurs du modèle "factor" (défaut : min(10, N))
+        self.garch_params = {}
+        self.instrumentation = NullInstrumentation()
+
+    def __getstate__(self):
+        # L'instrumentation (sinks, callbacks) reste dans le processus principal
+        state = self.__dict__.copy()
+        state["instrumentation"] = NullInstrumentation()
+        return state
 
     def volatility_estimation(self, market_data: dict, T_days: int):
         """
@@ -16,36 +150,199 @@ class MCDiffusion:
         Retourne un dictionnaire {actif: [sigma_1, sigma_2, ..., sigma_T]}
         """
         vol_estimation = {}
+        universe = MarketDataUniverse.of(market_data)
 
-        for asset, data in market_data.items():
-            prices = data.data.sort_values("Date")["Price"]
-            returns = np.log(prices / prices.shift(1)).dropna()
-
-            model = arch_model(returns, vol="Garch", p=1, q=1)
-            res = model.fit(disp="off")
+        if self.garch_backend == "batched":
+            # Départ à chaud : paramètres de l'appel précédent (ex. veille), NaN pour un nouvel actif
+            initial_params = np.array([self.garch_params.get(asset, np.full(4, np.nan)) for asset in universe.assets])
+            params, sigma, _ = fit_universe(universe.returns, T_days, initial_params, n_workers=self.n_workers)
+            self.garch_params.update(zip(universe.assets, params))
+            return dict(zip(universe.assets, sigma))
 
-            # Prédiction de la volatilité sur T jours
-            forecast = res.forecast(start=0, horizon=T_days)
-            sigma_forecast = np.sqrt(forecast.variance.iloc[-1].values)  # Liste [sigma_1, sigma_2, ..., sigma_T]
-            vol_estimation[asset] = sigma_forecast
+        for asset in universe.assets:
+            # Paramètres [mu, omega, alpha, beta] et prévision [sigma_1, sigma_2, ..., sigma_T]
+            self.garch_params[asset], vol_estimation[asset] = _fit_arch(universe.asset_returns(asset), T_days)
 
         return vol_estimation  # {CAC40: [σ_1, σ_2, ..., σ_T], TTEF: [...]}
 
 
     def correlation_estimation(self, market_data: dict):
         """
-        Estimation de la matrice de corrélation des rendements.
+        Estimation de la matrice de corrélation des rendements, alignés sur les dates,
+        selon `correlation_model` (None pour le modèle à facteurs, qui ne la forme pas).
+        """
+        universe = MarketDataUniverse.of(market_data)
+        if self.correlation_model == "ledoit_wolf":
+            return ledoit_wolf_correlation(universe.returns)[0]
+        if self.correlation_model == "factor":
+            return None
+        return universe.correlation()
+
+    def correlation_mixing(self, market_data: dict, correlation_matrix: np.ndarray):
+        """
+        Modèle de mélange des chocs (CholeskyMixing ou FactorMixing) : fournit `n_shocks`
+        chocs indépendants par date et `mix(z)` pour obtenir les chocs corrélés des actifs.
+        """
+        if self.correlation_model == "factor":
+            returns = MarketDataUniverse.of(market_data).returns
+            return FactorMixing.from_returns(returns, self.factors or min(10, returns.shape[1]))
+        return CholeskyMixing.from_correlation(correlation_matrix)
+
+    def calibrate(self, market_data: dict, T_days: int):
+        """
+        Calibration complète : volatilités GARCH, matrice de corrélation et modèle de mélange
+        des chocs (facteur de Cholesky ou modèle à facteurs).
+        Si un cache disque est configuré, les résultats sont relus lorsque la clé
+        (contenu des séries, date, horizon, modèle) est connue, sans aucun ajustement GARCH.
+
+        Retourne (vol_estimation, correlation_matrix, mixing) ; correlation_matrix vaut None
+        pour le modèle à facteurs.
+        """
+        with self.instrumentation.stage("calibration"):
+            return self._calibrate(market_data, T_days)
+
+    def _calibrate(self, market_data: dict, T_days: int):
+        market_data = MarketDataUniverse.of(market_data)
+        key = None
+        if self.cache is not None:
+            spec = (f"{MODEL_SPEC}|backend={self.garch_backend}|correlation={self.correlation_model}"
+                    f"|factors={self.factors}")
+            key = self.cache.key(market_data, self.date, T_days, spec)
+            cached = self.cache.load(key)
+            if cached is not None:
+                assets = [str(asset) for asset in cached["assets"]]
+                vol_estimation = dict(zip(assets, cached["sigma"]))
+                self.garch_params = dict(zip(assets, cached["params"]))
+                mixing = mixing_from_arrays(str(cached["mixing"]), {name[len("mixing_"):]: cached[name]
+                                                                     for name in cached if name.startswith("mixing_")})
+                return vol_estimation, cached.get("correlation"), mixing
+
+        vol_estimation = self.volatility_estimation(market_data, T_days)
+        correlation_matrix = self.correlation_estimation(market_data)
+        mixing = self.correlation_mixing(market_data, correlation_matrix)
+
+        if key is not None:
+            assets = list(vol_estimation)
+            self.cache.save(
+                key,
+                assets=np.array(assets),
+                sigma=np.array([vol_estimation[asset] for asset in assets]),
+                params=np.array([self.garch_params[asset] for asset in assets]),
+                mixing=np.array(mixing.kind),
+                **{f"mixing_{name}": array for name, array in mixing.to_arrays().items()},
+                **({} if correlation_matrix is None else {"correlation": correlation_matrix}),
+            )
+
+        return vol_estimation, correlation_matrix, mixing
+
+    def chunks(self):
+        """
+        Découpage des scénarios en blocs : liste de (indice du bloc, taille du bloc).
+        """
+        starts = range(0, self.number_samples, self.chunk_size)
+        return [(index, min(self.chunk_size, self.number_samples - start)) for index, start in enumerate(starts)]
+
+    def chunk_rng(self, chunk_index: int) -> np.random.Generator:
+        """
+        Générateur indépendant du bloc `chunk_index` : enfant de SeedSequence(seed),
+        identique à SeedSequence(seed).spawn(n)[chunk_index] pour tout n > chunk_index.
+        """
+        return np.random.default_rng(np.random.SeedSequence(self.seed, spawn_key=(chunk_index,)))
+
+    def standard_normals(self, chunk_index: int, size: int, numb_variable: int, T_days: int):
+        """
+        Chocs gaussiens indépendants du bloc `chunk_index` : générateur des T_days tableaux
+        (size, chocs) successifs, selon le mode de réduction de variance configuré.
+        Hors Sobol, chaque pas est tiré au fil de la diffusion à partir du générateur du
+        bloc : la mémoire ne dépend pas de T_days.
+        """
+        if self.variance_reduction == "sobol":
+            normals = self.sobol_normals(chunk_index, size, numb_variable, T_days)
+            for t in range(T_days):
+                yield normals[:, :, t]
+            return
+
+        rng = self.chunk_rng(chunk_index)
+        for _ in range(T_days):
+            if self.variance_reduction == "antithetic":
+                half = rng.standard_normal(size=((size + 1) // 2, numb_variable))
+                yield np.concatenate([half, -half])[:size]
+            else:
+                yield rng.standard_normal(size=(size, numb_variable))
+
+    def sobol_normals(self, chunk_index: int, size: int, numb_variable: int, T_days: int) -> np.ndarray:
+        """
+        Chocs quasi-aléatoires du bloc `chunk_index` (Sobol brouillé et pont brownien),
+        de forme (size, chocs, T_days).
+        """
+        if T_days * numb_variable > SOBOL_MAX_DIMENSIONS:
+            raise ValueError(f"Sobol limité à {SOBOL_MAX_DIMENSIONS} dimensions (T_days x chocs) : "
+                             f"{T_days} x {numb_variable}")
+        engine = qmc.Sobol(d=T_days * numb_variable, scramble=True,
+                           seed=np.random.default_rng(np.random.SeedSequence(self.seed)))
+        if chunk_index > 0:
+            engine.fast_forward(chunk_index * self.chunk_size)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", UserWarning)  # Taille de bloc non puissance de 2
+            uniforms = engine.random(size)
+        normals = norm.ppf(np.clip(uniforms, 1e-12, 1 - 1e-12)).reshape(size, T_days, numb_variable)
+        return brownian_bridge_increments(normals)
+
+    def simulate(self, market_data: dict, vol_estimation: dict, mixing, horizons: tuple,
+                 shocks, number_samples: int, path_statistics: tuple = ()):
         """
-        returns_df = pd.DataFrame()
+        Diffusion d'un bloc de `number_samples` scénarios à partir d'une calibration donnée
+        et des chocs gaussiens indépendants `shocks`, itérable des max(horizons) tableaux
+        (number_samples, mixing.n_shocks) successifs (voir standard_normals).
+        Les chocs sont consommés et corrélés jour par jour (mixing.mix(z_t)) : aucun tenseur
+        (samples, actifs, T_days) n'est alloué, la mémoire ne dépend pas du nombre de pas.
+        Une seule diffusion jusqu'à l'horizon le plus long : les spots sont capturés
+        au passage à chaque horizon intermédiaire.
+
+        Les statistiques de trajectoire `path_statistics` (PathStatistic : somme, min / max,
+        franchissement de barrière) sont mises à jour en place à chaque pas et capturées
+        aux horizons, sans conserver les trajectoires (voir RunningStatistics).
 
-        for asset, data in market_data.items():
-            prices = data.data.sort_values("Date")["Price"]
-            returns_df[asset] = np.log(prices / prices.shift(1))
+        Retourne {horizon: ScenarioSet}.
+        """
+        assets = list(vol_estimation)
+        numb_variable = len(assets)
+        shocks = iter(shocks)
 
-        returns_df.dropna(inplace=True)
-        correlation_matrix = returns_df.corr() 
+        S_0 = np.array([market_data[asset].get_by_date(self.date) for asset in assets])
+        sigma_path = np.array([vol_estimation[asset] for asset in assets])  # (actifs, T_days)
 
-        return correlation_matrix.values 
+        S_t = np.ones((number_samples, numb_variable)) * S_0  # Initialisation des prix
+        statistics = RunningStatistics(path_statistics, assets, self.date, number_samples)
+        captured = {0: (S_t.copy(), statistics.snapshot())} if 0 in horizons else {}
+        for t in range(max(horizons)):
+            with self.instrumentation.stage("random_generation"):
+                normal_random = next(shocks)
+            with self.instrumentation.stage("correlation_mixing"):
+                mc_random = mixing.mix(normal_random)  # Chocs corrélés du jour t
+            with self.instrumentation.stage("diffusion"):
+                drift = -0.5 * sigma_path[:, t] ** 2 * (1 / 365)
+                shock = sigma_path[:, t] * np.sqrt(1 / 365) * mc_random
+                S_t *= np.exp(drift + shock)
+            if path_statistics:
+                with self.instrumentation.stage("path_statistics"):
+                    statistics.update(t + 1, S_t)
+            if t + 1 in horizons:
+                captured[t + 1] = (S_t.copy(), statistics.snapshot())
+
+        return {horizon: ScenarioSet(date=pd.Timestamp(self.date), horizon=horizon,
+                                     spots={asset: spots[:, i] for i, asset in enumerate(assets)},
+                                     path_statistics=snapshot)
+                for horizon, (spots, snapshot) in captured.items()}
+
+    def scenario_chunk(self, market_data: dict, vol_estimation: dict, mixing, horizons: tuple,
+                       chunk_index: int, size: int, path_statistics: tuple = ()) -> dict:
+        """
+        Simule le bloc `chunk_index` avec son générateur dédié, les chocs étant tirés pas à pas.
+        Retourne {horizon: ScenarioSet} pour tous les horizons demandés.
+        """
+        shocks = self.standard_normals(chunk_index, size, mixing.n_shocks, max(horizons))
+        return self.simulate(market_data, vol_estimation, mixing, horizons, shocks, size, path_statistics)
 
     def diffuse(self, market_data: dict, T_days: int):
         """
@@ -55,30 +352,46 @@ class MCDiffusion:
 
         Retourne un dictionnaire {actif: liste de prix simulés à T jours}.
         """
-        vol_estimation = self.volatility_estimation(market_data, T_days)
-        cov_matrix = self.correlation_estimation(market_data)
-        L = np.linalg.cholesky(cov_matrix)  
-
-        numb_variable = len(cov_matrix)
-        
-        normal_random = np.random.normal(size=(self.number_samples, numb_variable, T_days))  # (10000, 3, 10)
+        chunks = [chunk[T_days] for chunk in self.iter_scenarios(market_data, T_days)]
+        return {asset: np.concatenate([chunk[asset] for chunk in chunks]) for asset in chunks[0].spots}  # {CAC40: [prix_1, ..., prix_N], ...}
 
-        mc_random = np.einsum("ij,njt->nit", L, normal_random)  # (10000, 3, 10)
-
-        rf = {}
-
-        for i, idx in enumerate(vol_estimation):
-            S_0 = market_data[idx].get_by_date(self.date)
-            sigma_path = vol_estimation[idx]  # Liste de volatilités pour chaque jour
-
-            S_t = np.ones((self.number_samples,)) * S_0  # Initialisation des prix
-            for t in range(T_days):
-                drift = -0.5 * sigma_path[t] ** 2 * (1 / 365)
-                shock = sigma_path[t] * np.sqrt(1 / 365) * mc_random[:, i, t]
-                S_t *= np.exp(drift + shock) 
+    def iter_scenarios(self, market_data: dict, T_days, path_statistics: tuple = ()):
+        """
+        Générateur de scénarios par blocs de `chunk_size` tirages (streaming).
+        `T_days` est un horizon ou une liste d'horizons : la calibration et la diffusion
+        sont faites une seule fois jusqu'à l'horizon le plus long, chaque bloc étant un
+        dictionnaire {horizon: ScenarioSet} partagé par toutes les transactions puis libéré.
+        Le pic mémoire de la diffusion est de l'ordre de chunk_size x actifs par horizon
+        capturé, indépendamment de number_samples et du nombre de pas (chocs tirés pas à pas,
+        sauf en Sobol : chunk_size x chocs x max(T_days)) ; les statistiques de trajectoire
+        demandées (`path_statistics`) ajoutent chunk_size valeurs chacune.
+        """
+        horizons = as_horizons(T_days)
+        market_data = MarketDataUniverse.of(market_data)
+        vol_estimation, _, mixing = self.calibrate(market_data, max(horizons))
 
-            rf[idx] = S_t 
+        for chunk_index, size in self.chunks():
+            yield self.scenario_chunk(market_data, vol_estimation, mixing, horizons, chunk_index, size,
+                                      path_statistics)
 
-        return rf  # {CAC40: [prix_1, prix_2, ..., prix_N], ...}
+    def map_scenarios(self, market_data: dict, T_days, consumer, path_statistics: tuple = ()):
+        """
+        Applique `consumer({horizon: scenario_set})` à chaque bloc de scénarios et retourne
+        les résultats dans l'ordre des blocs. Avec n_workers > 1, diffusion et consommation
+        (ex. revalorisation) sont réparties sur un pool de processus ; `consumer` doit
+        alors être sérialisable (fonction de module ou objet picklable).
+        """
+        if self.n_workers <= 1:
+            for scenario_sets in self.iter_scenarios(market_data, T_days, path_statistics):
+                yield consumer(scenario_sets)
+            return
 
+        horizons = as_horizons(T_days)
+        market_data = MarketDataUniverse.of(market_data)
+        vol_estimation, _, mixing = self.calibrate(market_data, max(horizons))
+        chunk_indices, sizes = zip(*self.chunks())
 
+        with ProcessPoolExecutor(max_workers=self.n_workers, initializer=_init_worker,
+                                 initargs=(self, market_data, vol_estimation, mixing, horizons, consumer,
+                                           path_statistics)) as executor:
+            yield from executor.map(_run_chunk, chunk_indices, sizes)
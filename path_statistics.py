@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: babacardiallo
+"""
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+# Statistiques courantes disponibles : somme des fixations, minimum, maximum,
+# indicateurs de franchissement d'une barrière haute / basse
+PATH_STATISTICS = ("sum", "min", "max", "up", "down")
+
+
+class PathStatistic(NamedTuple):
+    """
+    Statistique de trajectoire déclarée par un produit (voir Pricer.path_statistics),
+    clé des statistiques simulées d'un ScenarioSet.
+
+    Paramètres :
+    ------------
+    - asset : str -> Sous-jacent
+    - name : str -> Statistique (PATH_STATISTICS)
+    - level : float -> Niveau de barrière ('up' / 'down')
+    - start : pd.Timestamp -> Première date d'observation (None : dès la date de calcul)
+    """
+    asset: str
+    name: str
+    level: float = None
+    start: pd.Timestamp = None
+
+
+class RunningStatistics:
+    """
+    Statistiques courantes des trajectoires simulées, mises à jour en place à chaque pas
+    de la diffusion : seules les statistiques demandées sont tenues, un vecteur
+    (n_scénarios,) chacune. La mémoire ne dépend pas du nombre de pas, contrairement au
+    stockage des trajectoires complètes (n_scénarios x actifs x T_days).
+
+    Le pas k correspond à la date de calcul + k jours ; le spot de la date de calcul
+    (pas 0) n'est pas compté, il relève de l'historique. Une statistique dont la date
+    `start` est postérieure n'est mise à jour qu'à partir du pas correspondant.
+
+    Paramètres :
+    ------------
+    - statistics : tuple -> Statistiques à tenir (PathStatistic)
+    - assets : list -> Actifs, dans l'ordre des colonnes des spots
+    - date : str -> Date de calcul (pas 0)
+    - number_samples : int -> Nombre de scénarios du bloc
+    """
+
+    def __init__(self, statistics: tuple, assets: list, date, number_samples: int):
+        self.columns, self.first_steps, self.values = {}, {}, {}
+        for statistic in dict.fromkeys(statistics):
+            if statistic.name not in PATH_STATISTICS:
+                raise ValueError(f"Statistique de trajectoire inconnue : {statistic.name}")
+            self.columns[statistic] = assets.index(statistic.asset)
+            self.first_steps[statistic] = (max((pd.Timestamp(statistic.start) - pd.Timestamp(date)).days, 1)
+                                           if statistic.start is not None else 1)
+            if statistic.name in ("up", "down"):
+                self.values[statistic] = np.zeros(number_samples, dtype=bool)
+            else:
+                initial = {"sum": 0.0, "min": np.inf, "max": -np.inf}[statistic.name]
+                self.values[statistic] = np.full(number_samples, initial)
+
+    def update(self, step: int, spots: np.ndarray):
+        """
+        Prise en compte des spots (n_scénarios, actifs) du pas `step`.
+        """
+        for statistic, column in self.columns.items():
+            if step < self.first_steps[statistic]:
+                continue
+            S, value = spots[:, column], self.values[statistic]
+            if statistic.name == "sum":
+                value += S
+            elif statistic.name == "min":
+                np.minimum(value, S, out=value)
+            elif statistic.name == "max":
+                np.maximum(value, S, out=value)
+            elif statistic.name == "up":
+                value |= S >= statistic.level
+            else:
+                value |= S <= statistic.level
+
+    def snapshot(self) -> dict:
+        """
+        Copie des statistiques au pas courant : {PathStatistic: np.ndarray}.
+        """
+        return {statistic: value.copy() for statistic, value in self.values.items()}
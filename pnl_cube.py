@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: babacardiallo
+"""
+import json
+from typing import NamedTuple
+
+import numpy as np
+
+from portfolio import PortfolioPnL
+
+# Nombre de scénarios lus par bloc lors des agrégations (borne la mémoire de lecture)
+READ_BLOCK = 262_144
+
+# Niveau de confiance des mesures lorsque les métadonnées du cube n'en indiquent pas
+DEFAULT_THRESHOLD = 0.99
+
+
+class DealRecord(NamedTuple):
+    """
+    Attributs d'une transaction conservés dans les métadonnées du cube ("deals") :
+    regroupements (PortfolioPnL.aggregate) et poids signés (position_weight).
+    """
+    type: str
+    underlying: str
+    currency: str
+    position: str
+    notional: float
+
+
+class PnLCube:
+    """
+    Cube de PnL scénarios x transactions x horizons stocké sur disque (.npy
+    memory-mappé), accompagné d'un fichier de métadonnées JSON (`<path>.json`) :
+    identifiants des transactions, horizons, graine, date de calcul, etc.
+
+    Le PnL stocké est signé et pondéré (position x notional), comme dans PortfolioPnL.
+    Les mesures sur un sous-ensemble de transactions sont calculées directement depuis
+    le fichier, par blocs de scénarios, sans charger le cube en mémoire : seul le
+    vecteur de PnL agrégé (n_scénarios) est matérialisé. Le niveau de confiance
+    par défaut des mesures est celui de l'évaluation qui a produit le cube
+    (métadonnée "threshold").
+    """
+
+    def __init__(self, path: str, cube: np.ndarray, metadata: dict):
+        self.path = path
+        self.cube = cube
+        self.metadata = metadata
+        self.deal_ids = metadata["deal_ids"]
+        self.horizons = metadata["horizons"]
+        self.threshold = metadata.get("threshold", DEFAULT_THRESHOLD)
+
+    @classmethod
+    def create(cls, path: str, number_samples: int, deal_ids: list, horizons: list, dtype: str = "float64",
+               **metadata) -> "PnLCube":
+        """
+        Crée le fichier du cube (rempli ensuite par le producteur) et son fichier de métadonnées.
+        """
+        if np.dtype(dtype) not in (np.dtype("float32"), np.dtype("float64")):
+            raise ValueError(f"Type de stockage non supporté : {dtype}")
+        cube = np.lib.format.open_memmap(path, mode="w+", dtype=dtype,
+                                         shape=(number_samples, len(deal_ids), len(horizons)))
+        metadata = {"deal_ids": list(deal_ids), "horizons": [int(h) for h in horizons], "dtype": str(np.dtype(dtype)),
+                    "number_samples": number_samples, **metadata}
+        with open(cls.metadata_path(path), "w") as f:
+            json.dump(metadata, f, indent=2, default=str)
+        return cls(path, cube, metadata)
+
+    @classmethod
+    def open(cls, path: str) -> "PnLCube":
+        """
+        Ouvre un cube existant en lecture seule (memory-map).
+        """
+        with open(cls.metadata_path(path)) as f:
+            metadata = json.load(f)
+        return cls(path, np.load(path, mmap_mode="r"), metadata)
+
+    @staticmethod
+    def metadata_path(path: str) -> str:
+        return f"{path}.json"
+
+    def horizon_view(self, horizon: int) -> np.ndarray:
+        """
+        Vue (n_scénarios, n_transactions) du cube pour un horizon, sans copie.
+        """
+        return self.cube[:, :, self.horizons.index(int(horizon))]
+
+    def flush(self):
+        if isinstance(self.cube, np.memmap):
+            self.cube.flush()
+
+    def _deal_ids(self, deal_ids: list = None) -> list:
+        return self.deal_ids if deal_ids is None else list(deal_ids)
+
+    def portfolio_pnl(self, horizon: int, deal_ids: list = None) -> np.ndarray:
+        """
+        PnL agrégé par scénario sur `deal_ids` (toutes les transactions si None),
+        lu par blocs de READ_BLOCK scénarios.
+        """
+        view = self.horizon_view(horizon)
+        columns = np.array([self.deal_ids.index(deal_id) for deal_id in self._deal_ids(deal_ids)], dtype=np.intp)
+        total = np.empty(view.shape[0])
+        for start in range(0, view.shape[0], READ_BLOCK):
+            total[start:start + READ_BLOCK] = view[start:start + READ_BLOCK, columns].sum(axis=1, dtype=np.float64)
+        return total
+
+    def value_at_risk(self, horizon: int, deal_ids: list = None, threshold: float = None) -> float:
+        threshold = self.threshold if threshold is None else threshold
+        return float(np.percentile(self.portfolio_pnl(horizon, deal_ids), (1 - threshold) * 100))
+
+    def expected_shortfall(self, horizon: int, deal_ids: list = None, threshold: float = None) -> float:
+        threshold = self.threshold if threshold is None else threshold
+        total = self.portfolio_pnl(horizon, deal_ids)
+        return float(total[total <= np.percentile(total, (1 - threshold) * 100)].mean())
+
+    def to_portfolio(self, horizon: int, deal_ids: list = None, threshold: float = None) -> PortfolioPnL:
+        """
+        Charge les colonnes `deal_ids` d'un horizon en PortfolioPnL (VaR en composantes,
+        incrémentale, marginale, regroupements par 'type', 'underlying', 'currency' ou
+        'position') ; mémoire n_scénarios x len(deal_ids). Les transactions sont
+        reconstruites (DealRecord) depuis la métadonnée "deals" ; un cube qui ne la
+        contient pas demande des poids explicites et un regroupement par dict.
+        """
+        deal_ids = self._deal_ids(deal_ids)
+        columns = [self.deal_ids.index(deal_id) for deal_id in deal_ids]
+        pnl = np.asarray(self.horizon_view(horizon)[:, columns], dtype=np.float64)
+        deals = {deal_id: DealRecord(**self.metadata["deals"][deal_id])
+                 for deal_id in deal_ids if deal_id in self.metadata.get("deals", {})}
+        return PortfolioPnL(pnl, deal_ids, deals, self.threshold if threshold is None else threshold)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: babacardiallo
+"""
+import math
+
+import numpy as np
+
+# Somme des composantes de VaR, relativement à la somme de leurs valeurs absolues, en deçà de
+# laquelle la normalisation sur la VaR du portefeuille n'est pas appliquée (book couvert)
+COMPONENT_SCALE_TOLERANCE = 1e-6
+
+
+def position_weight(deal) -> float:
+    """
+    Poids signé d'une transaction dans le book : +notional si Long, -notional si Short.
+    """
+    sign = -1.0 if str(deal.position).strip().lower() == "short" else 1.0
+    return sign * float(deal.notional)
+
+
+class PortfolioPnL:
+    """
+    Matrice de PnL scénarios x transactions, sur un jeu de scénarios commun,
+    signée et pondérée par position et notional. Toutes les mesures de risque
+    du book s'en déduisent par opérations matricielles, sans nouvelle simulation.
+
+    Convention : comme pour les résultats par transaction, la VaR est le quantile
+    (1 - threshold) du PnL (valeur négative en cas de perte) et l'ES la moyenne
+    du PnL au-delà de ce quantile.
+
+    Paramètres :
+    ------------
+    - pnl : np.ndarray -> Matrice (n_scénarios, n_transactions) du PnL pondéré
+    - deal_ids : list -> Identifiants des colonnes
+    - deals : dict -> {deal_id: Deal}, utilisé pour les regroupements par attribut et les
+      poids de la VaR marginale (tout objet portant les attributs utilisés convient)
+    - threshold : float -> Niveau de confiance (ex. 0.99)
+    """
+
+    def __init__(self, pnl: np.ndarray, deal_ids: list, deals: dict = None, threshold: float = 0.99):
+        self.pnl = pnl
+        self.deal_ids = list(deal_ids)
+        self.deals = deals or {}
+        self.threshold = threshold
+        self.quantile = 1 - threshold
+
+    @property
+    def total(self) -> np.ndarray:
+        """
+        PnL du portefeuille par scénario.
+        """
+        return self.pnl.sum(axis=1)
+
+    def value_at_risk(self) -> float:
+        return float(np.percentile(self.total, self.quantile * 100))
+
+    def expected_shortfall(self) -> float:
+        total = self.total
+        return float(total[total <= np.percentile(total, self.quantile * 100)].mean())
+
+    def _var_window(self, total: np.ndarray) -> np.ndarray:
+        """
+        Indices des scénarios dont le PnL du portefeuille est le plus proche de la VaR :
+        fenêtre de ±sqrt(n * q) statistiques d'ordre autour du rang du quantile.
+        """
+        n = len(total)
+        rank = int(round((n - 1) * self.quantile))
+        half_width = max(1, int(math.sqrt(n * self.quantile)))
+        order = np.argpartition(total, [max(rank - half_width, 0), min(rank + half_width, n - 1)])
+        return order[max(rank - half_width, 0):min(rank + half_width, n - 1) + 1]
+
+    def component_var(self) -> dict:
+        """
+        VaR en composantes (allocation d'Euler) : E[PnL_i | PnL portefeuille = VaR],
+        estimée sur la fenêtre de scénarios autour du quantile puis normalisée
+        pour que la somme des composantes soit exactement la VaR du portefeuille.
+        Si cette somme est quasi nulle devant les composantes (COMPONENT_SCALE_TOLERANCE,
+        ex. book couvert), la normalisation serait instable : l'estimation est retournée telle quelle.
+        """
+        total = self.total
+        window = self._var_window(total)
+        components = self.pnl[window].mean(axis=0)
+        scale = 1.0
+        if abs(components.sum()) > COMPONENT_SCALE_TOLERANCE * np.abs(components).sum():
+            scale = self.value_at_risk() / components.sum()
+        return dict(zip(self.deal_ids, components * scale))
+
+    def component_es(self) -> dict:
+        """
+        ES en composantes : E[PnL_i | PnL portefeuille <= VaR], additive par construction.
+        """
+        total = self.total
+        tail = total <= np.percentile(total, self.quantile * 100)
+        return dict(zip(self.deal_ids, self.pnl[tail].mean(axis=0)))
+
+    def marginal_var(self, weights: dict = None) -> dict:
+        """
+        VaR marginale : sensibilité de la VaR du portefeuille à une unité de position
+        (composante d'Euler divisée par le poids signé de la transaction). Poids déduits
+        de `deals` par défaut ; à fournir pour un portefeuille sans transactions (ex. aggregate).
+        """
+        if weights is None:
+            missing = [deal_id for deal_id in self.deal_ids if deal_id not in self.deals]
+            if missing:
+                raise ValueError(f"Poids requis pour les colonnes sans transaction : {missing}")
+            weights = {deal_id: position_weight(self.deals[deal_id]) for deal_id in self.deal_ids}
+        return {deal_id: component / weights[deal_id] if weights[deal_id] else 0.0
+                for deal_id, component in self.component_var().items()}
+
+    def incremental_var(self) -> dict:
+        """
+        VaR incrémentale : VaR(portefeuille) - VaR(portefeuille sans la transaction i),
+        calculée pour toutes les transactions en une seule opération matricielle.
+        """
+        total = self.total
+        without = total[:, None] - self.pnl
+        return dict(zip(self.deal_ids, self.value_at_risk() - np.percentile(without, self.quantile * 100, axis=0)))
+
+    def aggregate(self, by) -> "PortfolioPnL":
+        """
+        Regroupe les colonnes par attribut de transaction (ex. 'underlying', 'currency')
+        ou selon un dict {deal_id: groupe} (ex. desk) : simple somme de colonnes, via le
+        produit avec la matrice indicatrice transactions x groupes. Le portefeuille
+        agrégé n'a pas de transactions : marginal_var y demande des poids explicites.
+        """
+        if isinstance(by, dict):
+            labels = [by[deal_id] for deal_id in self.deal_ids]
+        else:
+            missing = [deal_id for deal_id in self.deal_ids
+                       if deal_id not in self.deals or not hasattr(self.deals[deal_id], by)]
+            if missing:
+                raise ValueError(f"Attribut '{by}' inconnu pour les transactions : {missing}")
+            labels = [getattr(self.deals[deal_id], by) for deal_id in self.deal_ids]
+        groups = list(dict.fromkeys(labels))
+        indicator = np.zeros((len(labels), len(groups)))
+        indicator[np.arange(len(labels)), [groups.index(label) for label in labels]] = 1.0
+        return PortfolioPnL(self.pnl @ indicator, groups, threshold=self.threshold)
+
+    def summary(self) -> dict:
+        return {
+            "VaR portefeuille": self.value_at_risk(),
+            "ES portefeuille": self.expected_shortfall(),
+            "VaR en composantes": self.component_var(),
+            "VaR incrémentale": self.incremental_var(),
+        }
@@ -5,9 +5,12 @@
 """
 import pandas as pd
 from datetime import datetime
-from Deal.deal import Call, Put, Future
+from Deal.deal import Call, Put, Future, Asian, Barrier
 from MarketData.marketdata import Equity, Rate
 
+# Facteurs de risque connus -> type de série de marché
+MARKET_DATA_TYPES = {'CAC40': Equity, 'TTEF': Equity, 'FR6MBond': Rate}
+
 class DealPreprocessing:
     """
     Classe pour le préprocessing des données financières ou des contrats
@@ -94,6 +97,37 @@ class DealPreprocessing:
             maturity=self._get_date(self.root, "maturity")
         )
 
+    def build_asian(self) -> Asian:
+        return Asian(
+            deal_id=self._get_text(self.root, "name"),
+            position=self._get_text(self.root, "position"),
+            notional=self._get_value(self.root, "notional"),
+            currency=self._get_text(self.root, "currency"),
+            underlying=self._get_text(self.root, "underlying"),
+            rate_const=self._get_value(self.root, "rate_const"),
+            vol_const=self._get_value(self.root, "vol_const"),
+            strike=self._get_value(self.root, "strike"),
+            start_date=self._get_date(self.root, "start_date"),
+            maturity=self._get_date(self.root, "maturity"),
+            option_type=self._get_text(self.root, "option_type")
+        )
+
+    def build_barrier(self) -> Barrier:
+        return Barrier(
+            deal_id=self._get_text(self.root, "name"),
+            position=self._get_text(self.root, "position"),
+            notional=self._get_value(self.root, "notional"),
+            currency=self._get_text(self.root, "currency"),
+            underlying=self._get_text(self.root, "underlying"),
+            rate_const=self._get_value(self.root, "rate_const"),
+            vol_const=self._get_value(self.root, "vol_const"),
+            strike=self._get_value(self.root, "strike"),
+            start_date=self._get_date(self.root, "start_date"),
+            maturity=self._get_date(self.root, "maturity"),
+            option_type=self._get_text(self.root, "option_type"),
+            barrier=self._get_value(self.root, "barrier"),
+            barrier_type=self._get_text(self.root, "barrier_type")
+        )
 
     def build(self):
         """
@@ -112,6 +146,10 @@ class DealPreprocessing:
             deal = self.build_put()
         elif type_deal.lower() =='future':
             deal = self.build_future()
+        elif type_deal.lower() == 'asian':
+            deal = self.build_asian()
+        elif type_deal.lower() == 'barrier':
+            deal = self.build_barrier()
         else:
             NotImplemented
 
@@ -152,7 +190,20 @@ class MarketDataPreprocessing:
         - filepath : str
             Chemin vers le fichier CSV contenant les données de marché.
         """
-        self.market_state = pd.read_csv(filepath, sep=';')
+        # utf-8-sig : le BOM en tête des CSV ne doit pas se retrouver dans l'en-tête 'Date'
+        self.market_state = pd.read_csv(filepath, sep=';', encoding='utf-8-sig')
+
+    def build_series(self, name: str, series_type):
+        """
+        Construit une série de marché du type `series_type` (Equity, Rate, Commodity).
+        """
+        # Vérification que les colonnes attendues sont présentes
+        if "Date" not in self.market_state.columns or "Price" not in self.market_state.columns:
+            raise KeyError("CSV Col Missing...")
+
+        df_filtered = self.market_state.copy()
+        df_filtered["Date"] = pd.to_datetime(df_filtered["Date"], format="%m/%d/%Y")
+        return series_type(name=name, data=df_filtered)
 
     def build_equity(self, name: str) -> Equity:
         """
@@ -167,13 +218,7 @@ class MarketDataPreprocessing:
         ---------
         - Equity : objet Equity correspondant aux données.
         """
-        # Vérification que les colonnes attendues sont présentes
-        if "Date" not in self.market_state.columns or "Price" not in self.market_state.columns:
-            raise KeyError("CSV Col Missing...")
-
-        df_filtered = self.market_state.copy()
-        df_filtered["Date"] = pd.to_datetime(df_filtered["Date"], format="%m/%d/%Y")
-        return Equity(name=name, data=df_filtered)
+        return self.build_series(name, Equity)
 
     def build_rate(self, name: str) -> Rate:
         """
@@ -188,12 +233,7 @@ class MarketDataPreprocessing:
         ---------
         - Rate : objet Rate correspondant aux données.
         """
-        if "Date" not in self.market_state.columns or "Price" not in self.market_state.columns:
-            raise KeyError("CSV Col Missing...")
-
-        df_filtered = self.market_state.copy()
-        df_filtered["Date"] = pd.to_datetime(df_filtered["Date"], format="%m/%d/%Y")
-        return Rate(name=name, data=df_filtered)
+        return self.build_series(name, Rate)
 
     def build(self, data_name: str):
         """
@@ -213,9 +253,10 @@ class MarketDataPreprocessing:
         -----------
         - NotImplementedError : si le nom du type n'est pas géré.
         """
-        if data_name in ['CAC40', 'TTEF']:
+        data_type = MARKET_DATA_TYPES.get(data_name)
+        if data_type is Equity:
             risk_factor = self.build_equity(data_name)
-        elif data_name == 'FR6MBond':
+        elif data_type is Rate:
             risk_factor = self.build_rate(data_name)
         else:
             raise NotImplementedError(f"Type de données non supporté : {data_name}")
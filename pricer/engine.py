@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: babacardiallo
+"""
+import numpy as np
+import pandas as pd
+
+from Deal.deal import Call, Put, Future
+from Deal.dealbook import DEAL_TYPES, DealBook
+from pricer.factory import PricerFactory
+from pricer.pricer import CONVENTION_YEAR_FRACTION, call_price, put_price, future_price
+
+# Registre type de transaction -> noyau de valorisation vectorisé f(S, K, r, sigma, T)
+KERNELS = {Call: call_price, Put: put_price, Future: future_price}
+
+# Nombre d'éléments scénarios x transactions évalués par appel de noyau (borne les temporaires)
+BLOCK_ELEMENTS = 1 << 20
+
+
+class BookPricer:
+    """
+    Valorisation d'un book columnar (DealBook) sur un tableau de scénarios.
+
+    Les transactions sont regroupées une fois pour toutes par (type, sous-jacent) ;
+    chaque groupe est valorisé par un seul appel de noyau, en diffusant les spots
+    (1, n_scénarios) contre les paramètres des transactions (m, 1). Le coût Python est
+    donc proportionnel au nombre de groupes, et non de transactions x scénarios.
+    Les groupes volumineux sont découpés en blocs de transactions pour que les
+    tableaux temporaires restent de l'ordre de BLOCK_ELEMENTS éléments.
+
+    Paramètres :
+    ------------
+    - book : DealBook -> Transactions à valoriser (colonnes dans l'ordre du book)
+    """
+
+    def __init__(self, book: DealBook):
+        self.book = book
+        self.groups = {}  # {(type, sous-jacent): indices des transactions dans le book}
+        for deal_type, underlying in dict.fromkeys(zip(book.deal_type, book.underlying)):
+            if DEAL_TYPES[deal_type] not in KERNELS:
+                raise ValueError(f"Unknown pricer type: {deal_type}")
+            mask = (book.deal_type == deal_type) & (book.underlying == underlying)
+            self.groups[(str(deal_type), str(underlying))] = np.flatnonzero(mask)
+
+    @classmethod
+    def from_deals(cls, deals: dict) -> "BookPricer":
+        return cls(DealBook.from_deals(deals))
+
+    def time_to_maturity(self, calculation_date) -> np.ndarray:
+        date = np.datetime64(pd.to_datetime(calculation_date), "D")
+        return (self.book.maturity - date).astype(np.int64) / CONVENTION_YEAR_FRACTION
+
+    def price(self, calculation_date, risk_factor) -> np.ndarray:
+        """
+        Prix de toutes les transactions à `calculation_date`, le spot de chaque sous-jacent
+        étant lu dans `risk_factor` (dict de séries ou MarketScenario, comme Pricer.calculate).
+        Retourne un tableau (n_scénarios, n_transactions) ; (1, n_transactions) pour un spot unique.
+        C'est la transposée d'un tableau contigu par transaction : `price(...).T[j]` est
+        le vecteur de prix de la transaction j sans copie.
+        """
+        date = pd.to_datetime(calculation_date)
+        T = self.time_to_maturity(date)[:, None]
+        spots = {underlying: np.atleast_1d(np.asarray(
+                     risk_factor[underlying].get_by_date(date.strftime('%m/%d/%Y')), dtype=float))
+                 for underlying in dict.fromkeys(underlying for _, underlying in self.groups)}
+        number_scenarios = max(len(spot) for spot in spots.values())
+        prices = np.empty((len(self.book), number_scenarios))
+        strike, rate, vol = self.book.strike[:, None], self.book.rate[:, None], self.book.vol[:, None]
+
+        for (deal_type, underlying), index in self.groups.items():
+            kernel = KERNELS[DEAL_TYPES[deal_type]]
+            S = spots[underlying][None, :]
+            step = max(1, BLOCK_ELEMENTS // number_scenarios)
+            for start in range(0, len(index), step):
+                block = index[start:start + step]
+                prices[block] = kernel(S, strike[block], rate[block], vol[block], T[block])
+        return prices.T
+
+
+def required_statistics(deals: dict) -> tuple:
+    """
+    Statistiques de trajectoire (PathStatistic) à simuler pour valoriser `deals`, sans doublon.
+    """
+    return tuple(dict.fromkeys(statistic for deal in deals.values()
+                               for statistic in PricerFactory.create_pricer(deal.start_date, deal).path_statistics()))
+
+
+class Revaluation:
+    """
+    Revalorisation d'un book entre `calculation_date` et `target_date`, pour des états de
+    marché successifs à `target_date` (ex. blocs de scénarios) : le BookPricer des types
+    disposant d'un noyau vectorisé, les pricers des autres transactions et les prix à
+    `calculation_date` (spots lus dans `market_data`) sont établis une seule fois.
+
+    Paramètres :
+    ------------
+    - deals : dict -> {deal_id: Deal}
+    - calculation_date, target_date : -> Dates de calcul et de valorisation
+    - market_data : -> Données de marché de la date de calcul (dict de séries ou MarketDataUniverse)
+    - book : BookPricer -> BookPricer des transactions vectorisées de `deals`, dans l'ordre de `deals`
+      (None : construit ici ; un appelant qui revalorise le même book à plusieurs dates le réutilise)
+    """
+
+    def __init__(self, deals: dict, calculation_date, target_date, market_data, book: BookPricer = None):
+        self.deal_ids = list(deals)
+        self.target_date = target_date
+        self.vectorized = [deal_id for deal_id, deal in deals.items() if type(deal) in KERNELS]
+        self.book = book
+        if self.vectorized and book is None:
+            self.book = BookPricer.from_deals({deal_id: deals[deal_id] for deal_id in self.vectorized})
+        if self.vectorized:
+            self.theoretical_prices = self.book.price(calculation_date, market_data)[0]
+        # {deal_id: (pricer à la date cible, prix à la date de calcul)} des autres transactions
+        self.pricers = {deal_id: (PricerFactory.create_pricer(target_date, deal),
+                                  PricerFactory.create_pricer(calculation_date, deal).calculate(market_data))
+                        for deal_id, deal in deals.items() if type(deal) not in KERNELS}
+
+    def pnl(self, market_state) -> dict:
+        """
+        PnL de chaque transaction, prix à `target_date` lus dans `market_state` : {deal_id: np.ndarray}.
+        """
+        pnl = {}
+        if self.vectorized:
+            prices = self.book.price(self.target_date, market_state).T - self.theoretical_prices[:, None]
+            pnl.update(zip(self.vectorized, prices))
+        for deal_id, (pricer, theoretical_price) in self.pricers.items():
+            pnl[deal_id] = pricer.calculate(market_state) - theoretical_price
+        return {deal_id: pnl[deal_id] for deal_id in self.deal_ids}
+
+    def weighted_pnl(self, market_state, weights: dict) -> np.ndarray:
+        """
+        PnL du book pondéré par `weights` ({deal_id: poids}) ; la partie vectorisée est réduite
+        par un produit matriciel, sans passer par le PnL de chaque transaction.
+        """
+        total = 0.0
+        if self.vectorized:
+            vector = np.array([weights[deal_id] for deal_id in self.vectorized])
+            total = self.book.price(self.target_date, market_state) @ vector - self.theoretical_prices @ vector
+        for deal_id, (pricer, theoretical_price) in self.pricers.items():
+            total = total + weights[deal_id] * (pricer.calculate(market_state) - theoretical_price)
+        return total
+
+
+def revalue(deals: dict, calculation_date, target_date, market_data, market_state) -> dict:
+    """
+    PnL de chaque transaction entre son prix à `calculation_date` (spots lus dans
+    `market_data`) et son prix à `target_date` (spots lus dans `market_state`, ex.
+    scénarios simulés ou marché réalisé) : {deal_id: np.ndarray}. Les types disposant
+    d'un noyau vectorisé sont valorisés ensemble par un BookPricer, les autres par leur pricer.
+    Les produits path-dependent lisent leurs statistiques de trajectoire dans `market_state`
+    (scénarios simulés avec required_statistics(deals)) ou dans l'historique.
+    Pour plusieurs états de marché à la même date cible, voir Revaluation.
+    """
+    return Revaluation(deals, calculation_date, target_date, market_data).pnl(market_state)
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: babacardiallo
+"""
+import abc
+from dataclasses import replace
+
+import numpy as np
+import pandas as pd
+from scipy.special import ndtr
+
+from Deal.deal import Asian, Barrier
+from path_statistics import PathStatistic
+from pricer.pricer import CONVENTION_YEAR_FRACTION, Pricer, call_price, put_price
+
+# Type d'option -> signe phi du payoff max(phi (S - K), 0)
+OPTION_TYPES = {"Call": 1, "Put": -1}
+
+# Types de barrière : sens de franchissement et effet (activante / désactivante)
+BARRIER_TYPES = ("up-and-in", "up-and-out", "down-and-in", "down-and-out")
+
+# Correction de continuité de Broadie-Glasserman-Kou (beta = -zeta(1/2) / sqrt(2 pi)) : une barrière
+# observée chaque jour équivaut à une barrière continue décalée de exp(± beta sigma sqrt(1 / 365))
+BARRIER_SHIFT = 0.5826
+
+# Choc relatif du spot et choc absolu de volatilité des sensibilités par différences finies
+FINITE_DIFFERENCE_BUMP = 1e-4
+
+
+def asian_price(S, fixed_sum, fixed_count, K, r, sigma, T, fixing_times, phi):
+    """
+    Prix d'une option asiatique arithmétique par ajustement des deux premiers moments
+    de la somme des fixations restantes sur une loi lognormale (Turnbull-Wakeman, Levy).
+
+    Paramètres :
+    ------------
+    - S : float | np.ndarray -> Spot(s) du sous-jacent
+    - fixed_sum, fixed_count : -> Somme (scalaire ou par scénario) et nombre des fixations déjà observées
+    - K, r, sigma, T : float -> Strike, taux, volatilité, maturité en années
+    - fixing_times : np.ndarray -> Dates des fixations restantes, en années
+    - phi : int -> 1 pour un call, -1 pour un put
+    """
+    S = np.asarray(S, dtype=float)
+    total = fixed_count + len(fixing_times)
+    if not len(fixing_times):
+        return np.maximum(phi * (fixed_sum / total - K), 0) * np.ones_like(S)
+
+    # Strike effectif sur la somme des fixations restantes
+    strike = total * K - fixed_sum
+    growth = np.exp(r * fixing_times)
+    later = np.cumsum(growth[::-1])[::-1] - growth  # sum_{j > i} exp(r t_j)
+    first = growth.sum()  # E[somme] / S
+    second = np.sum(np.exp((r + sigma ** 2) * fixing_times) * (growth + 2 * later))  # E[somme²] / S²
+    mean = S * first
+    variance = np.log(second / first ** 2)  # Variance du log de la somme lognormale ajustée
+    with np.errstate(divide="ignore", invalid="ignore"):
+        d1 = (np.log(mean) - np.log(strike) + 0.5 * variance) / np.sqrt(variance)
+    d2 = d1 - np.sqrt(variance)
+    option = phi * (mean * ndtr(phi * d1) - strike * ndtr(phi * d2))
+    # Strike effectif négatif : exercice certain, valeur forward
+    price = np.where(strike > 0, option, np.maximum(phi * (mean - strike), 0))
+    return np.exp(-r * max(T, 0)) * price / total
+
+
+def _knock_out_price(S, K, H, r, sigma, T, phi, up):
+    """
+    Prix d'une option désactivante non franchie (Reiner-Rubinstein, sans rebate ni dividende).
+    """
+    vol_sqrt_T = sigma * np.sqrt(T)
+    mu = (r - 0.5 * sigma ** 2) / sigma ** 2
+    eta = -1 if up else 1
+    discount = K * np.exp(-r * T)
+    shift = (1 + mu) * vol_sqrt_T
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x1 = np.log(S / K) / vol_sqrt_T + shift
+        x2 = np.log(S / H) / vol_sqrt_T + shift
+        y1 = np.log(H * H / (S * K)) / vol_sqrt_T + shift
+        y2 = np.log(H / S) / vol_sqrt_T + shift
+        ratio = H / S
+
+    def vanilla_term(x):
+        return phi * S * ndtr(phi * x) - phi * discount * ndtr(phi * (x - vol_sqrt_T))
+
+    def image_term(y):
+        return (phi * S * ratio ** (2 * (mu + 1)) * ndtr(eta * y)
+                - phi * discount * ratio ** (2 * mu) * ndtr(eta * (y - vol_sqrt_T)))
+
+    A, B, C, D = vanilla_term(x1), vanilla_term(x2), image_term(y1), image_term(y2)
+    above = K > H
+    if phi > 0 and not up:
+        return A - C if above else B - D
+    if phi > 0:
+        return np.zeros_like(S) if above else A - B + C - D
+    if not up:
+        return A - B + C - D if above else np.zeros_like(S)
+    return B - D if above else A - C
+
+
+def barrier_price(S, K, H, r, sigma, T, phi, barrier_type, hit=False):
+    """
+    Prix d'une option à barrière observée chaque jour : formule de Reiner-Rubinstein
+    (barrière continue) à la barrière corrigée de BARRIER_SHIFT, activante par parité
+    (activante + désactivante = vanille). Une barrière déjà franchie (`hit`, ou spot
+    au-delà de la barrière) donne la vanille (activante) ou 0 (désactivante).
+    Payoff si T <= 0.
+
+    Paramètres :
+    ------------
+    - S : float | np.ndarray -> Spot(s) du sous-jacent
+    - K, H, r, sigma, T : float -> Strike, barrière, taux, volatilité, maturité en années
+    - phi : int -> 1 pour un call, -1 pour un put
+    - barrier_type : str -> BARRIER_TYPES
+    - hit : bool | np.ndarray -> Barrière franchie depuis le début de l'observation
+    """
+    S = np.asarray(S, dtype=float)
+    up, knock_in = barrier_type.startswith("up"), barrier_type.endswith("in")
+    hit = np.asarray(hit) | ((S >= H) if up else (S <= H))
+    vanilla = (call_price if phi > 0 else put_price)(S, K, r, sigma, T)
+    if T <= 0:
+        return np.where(hit == knock_in, vanilla, 0.0)
+
+    shifted = H * np.exp((1 if up else -1) * BARRIER_SHIFT * sigma * np.sqrt(1 / CONVENTION_YEAR_FRACTION))
+    knock_out = np.maximum(_knock_out_price(S, K, shifted, r, sigma, T, phi, up), 0.0)
+    if knock_in:
+        return np.where(hit, vanilla, vanilla - knock_out)
+    return np.where(hit, 0.0, knock_out)
+
+
+class PathDependentPricer(Pricer):
+    """
+    Pricer d'un produit dont le payoff dépend de la trajectoire du sous-jacent depuis
+    sa date de début (fixations, franchissement de barrière).
+
+    Les statistiques de trajectoire sont lues dans l'historique jusqu'à la date de
+    valorisation ; pour un MarketScenario issu d'une diffusion (`origin` renseigné),
+    l'historique s'arrête à la date de calcul des scénarios et les statistiques
+    simulées entre cette date et la date de valorisation (`path_statistics`) le
+    complètent. Les fixations historiques sont les dates de cotation, les fixations
+    simulées et restantes un jour calendaire sur un (pas de la diffusion).
+    """
+
+    def __init__(self, calculation_date, instrument):
+        if instrument.option_type not in OPTION_TYPES:
+            raise ValueError(f"Type d'option inconnu : {instrument.option_type}")
+        self.calculation_date = pd.to_datetime(calculation_date)
+        self.instrument = instrument
+        self.phi = OPTION_TYPES[instrument.option_type]
+
+    def calculate(self, risk_factor):
+        S = risk_factor[self.instrument.underlying].get_by_date(self.calculation_date.strftime('%m/%d/%Y'))
+        price = self.calculate_batch(S, **self.observed(risk_factor))
+        return price if np.ndim(price) else float(price)
+
+    @abc.abstractmethod
+    def observed(self, risk_factor) -> dict:
+        """
+        Statistiques de trajectoire observées à la date de valorisation, arguments de calculate_batch.
+        """
+        pass
+
+    def _history(self, risk_factor) -> np.ndarray:
+        """
+        Cours historiques de la période d'observation, jusqu'à la date de calcul des scénarios
+        (ou la date de valorisation hors scénario).
+        """
+        end = getattr(risk_factor, "origin", None) or self.calculation_date
+        dates, prices = risk_factor[self.instrument.underlying].as_arrays()
+        first = np.searchsorted(dates, pd.Timestamp(self.instrument.start_date).value, side="left")
+        last = np.searchsorted(dates, pd.Timestamp(end).value, side="right")
+        return prices[first:last]
+
+    def _simulated(self, risk_factor, statistic: PathStatistic):
+        """
+        Statistique simulée depuis l'origine des scénarios ; None hors scénario.
+        """
+        if getattr(risk_factor, "origin", None) is None:
+            return None
+        if statistic not in risk_factor.path_statistics:
+            raise KeyError(f"Statistique de trajectoire non simulée : {statistic}")
+        return risk_factor.path_statistics[statistic]
+
+    def greeks_batch(self, spots) -> dict:
+        """
+        Sensibilités par différences finies centrées de calculate_batch, trajectoire
+        observée par défaut (aucune fixation, barrière non franchie).
+        """
+        S = np.asarray(spots, dtype=float)
+        bump = FINITE_DIFFERENCE_BUMP * S
+        up, middle, down = self.calculate_batch(S + bump), self.calculate_batch(S), self.calculate_batch(S - bump)
+        vol = self.instrument.vol_const
+        shocked = type(self)(self.calculation_date, replace(self.instrument, vol_const=vol + FINITE_DIFFERENCE_BUMP))
+        return {"delta": (up - down) / (2 * bump), "gamma": (up - 2 * middle + down) / bump ** 2,
+                "vega": (shocked.calculate_batch(S) - middle) / FINITE_DIFFERENCE_BUMP}
+
+
+class AsianPricer(PathDependentPricer):
+    def __init__(self, calculation_date, instrument: Asian):
+        super().__init__(calculation_date, instrument)
+
+    def path_statistics(self) -> tuple:
+        return (PathStatistic(self.instrument.underlying, "sum", start=pd.Timestamp(self.instrument.start_date)),)
+
+    def observed(self, risk_factor) -> dict:
+        history = self._history(risk_factor)
+        fixed_sum, fixed_count = history.sum(), len(history)
+        simulated = self._simulated(risk_factor, self.path_statistics()[0])
+        if simulated is not None:
+            origin = risk_factor.origin
+            first = max((pd.Timestamp(self.instrument.start_date) - origin).days, 1)
+            fixed_sum = fixed_sum + simulated
+            fixed_count += max((self.calculation_date - origin).days - first + 1, 0)
+        return {"fixed_sum": fixed_sum, "fixed_count": fixed_count}
+
+    def calculate_batch(self, spots, fixed_sum=0.0, fixed_count: int = 0):
+        S = np.asarray(spots, dtype=float)
+        first = max((pd.Timestamp(self.instrument.start_date) - self.calculation_date).days, 1)
+        last = (self.instrument.maturity - self.calculation_date).days
+        fixing_times = np.arange(first, last + 1) / CONVENTION_YEAR_FRACTION
+        return asian_price(S, fixed_sum, fixed_count, self.instrument.strike, self.instrument.rate_const,
+                           self.instrument.vol_const, self.time_to_maturity(), fixing_times, self.phi)
+
+
+class BarrierPricer(PathDependentPricer):
+    def __init__(self, calculation_date, instrument: Barrier):
+        if instrument.barrier_type not in BARRIER_TYPES:
+            raise ValueError(f"Type de barrière inconnu : {instrument.barrier_type}")
+        super().__init__(calculation_date, instrument)
+
+    def path_statistics(self) -> tuple:
+        direction = self.instrument.barrier_type.split("-")[0]
+        return (PathStatistic(self.instrument.underlying, direction, level=self.instrument.barrier,
+                              start=pd.Timestamp(self.instrument.start_date)),)
+
+    def observed(self, risk_factor) -> dict:
+        history = self._history(risk_factor)
+        if self.instrument.barrier_type.startswith("up"):
+            hit = bool(np.any(history >= self.instrument.barrier))
+        else:
+            hit = bool(np.any(history <= self.instrument.barrier))
+        simulated = self._simulated(risk_factor, self.path_statistics()[0])
+        return {"hit": hit if simulated is None else hit | simulated}
+
+    def calculate_batch(self, spots, hit=False):
+        S = np.asarray(spots, dtype=float)
+        return barrier_price(S, self.instrument.strike, self.instrument.barrier, self.instrument.rate_const,
+                             self.instrument.vol_const, self.time_to_maturity(), self.phi,
+                             self.instrument.barrier_type, hit)
@@ -1,5 +1,10 @@
-from Deal.deal import Deal
+from Deal.deal import Deal, Call, Put, Future, Asian, Barrier
 from pricer.pricer import CallPricer, PutPricer, FuturePricer
+from pricer.exotic import AsianPricer, BarrierPricer
+
+# Registre type de transaction -> classe de pricer (recherche directe par classe)
+PRICERS = {Call: CallPricer, Put: PutPricer, Future: FuturePricer, Asian: AsianPricer, Barrier: BarrierPricer}
+
 
 class PricerFactory:
     def __init__(self):
@@ -8,18 +13,12 @@ class PricerFactory:
     @staticmethod
     def create_pricer(calculation_date, deal: Deal):
         """
-        Factory pour créer différents types de pricers.
-        :param pricer_type: Type de pricer à créer ('call', 'put', 'future').
-        :param underlying_price: Prix de l'actif sous-jacent.
-        :param strike: Prix d'exercice.
-        :param time_to_maturity: Temps jusqu'à l'échéance (en années).
+        Factory pour créer le pricer associé au type de la transaction (registre PRICERS).
+        :param calculation_date: Date de valorisation.
+        :param deal: Transaction à valoriser (Call, Put, Future, Asian, Barrier).
         :return: Une instance du pricer approprié.
         """
-        if deal.get_class_name().lower() == "call":
-            return CallPricer(calculation_date, deal)
-        elif deal.get_class_name().lower() == "put":
-            return PutPricer(calculation_date, deal)
-        elif deal.get_class_name().lower() == "future":
-            return FuturePricer(calculation_date, deal)
-        else:
+        pricer_class = PRICERS.get(type(deal))
+        if pricer_class is None:
             raise ValueError(f"Unknown pricer type: {deal.get_class_name()}")
+        return pricer_class(calculation_date, deal)
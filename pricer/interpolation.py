@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: babacardiallo
+"""
+import numpy as np
+from scipy.fft import dct
+
+from pricer.pricer import Pricer
+
+# Nombre de spots évalués par bloc dans Clenshaw (tampons en cache)
+EVALUATION_BLOCK = 65_536
+
+# Largeur de la grille de part et d'autre du spot, en écarts-types du rendement log à l'horizon
+GRID_SHOCKS = 6.0
+
+
+def lobatto_nodes(degree: int) -> np.ndarray:
+    """
+    Points de Chebyshev-Lobatto cos(pi j / degree), j = 0..degree, sur [-1, 1] (décroissants).
+    Les points de degré n sont les points pairs du degré 2n : doubler le degré
+    ne demande que les valeurs aux nouveaux points.
+    """
+    return np.cos(np.pi * np.arange(degree + 1) / degree)
+
+
+def chebyshev_coefficients(values: np.ndarray) -> np.ndarray:
+    """
+    Coefficients de Chebyshev du polynôme interpolant `values` aux points de Lobatto (DCT-I).
+    """
+    degree = len(values) - 1
+    coefficients = dct(values, type=1) / degree
+    coefficients[[0, -1]] /= 2
+    return coefficients
+
+
+def clenshaw(x: np.ndarray, coefficients: np.ndarray) -> np.ndarray:
+    """
+    Série de Chebyshev sum_k c_k T_k(x) par l'algorithme de Clenshaw, en place et par
+    blocs de EVALUATION_BLOCK points (équivalent à numpy.polynomial.chebyshev.chebval, sans temporaires).
+    """
+    x = np.asarray(x, dtype=float)
+    flat = x.reshape(-1)
+    result = np.empty_like(flat)
+    for start in range(0, len(flat), EVALUATION_BLOCK):
+        two_x = 2 * flat[start:start + EVALUATION_BLOCK]
+        b1, b2, tmp = np.zeros_like(two_x), np.zeros_like(two_x), np.empty_like(two_x)
+        for c in coefficients[:0:-1]:
+            # b_k = 2 x b_{k+1} - b_{k+2} + c_k
+            np.multiply(two_x, b1, out=tmp)
+            np.subtract(tmp, b2, out=b2)
+            b2 += c
+            b1, b2 = b2, b1
+        # f(x) = x b_1 - b_2 + c_0
+        np.multiply(0.5 * two_x, b1, out=tmp)
+        tmp -= b2
+        result[start:start + EVALUATION_BLOCK] = tmp + coefficients[0]
+    return result.reshape(x.shape)
+
+
+class InterpolatedPricer(Pricer):
+    """
+    Pricer par interpolation de Chebyshev d'un pricer quelconque sur une grille de spots.
+
+    Le pricer enveloppé n'est évalué qu'aux points de la grille, un spot à la fois
+    (calculate_batch sur un scalaire : aucun besoin qu'il soit vectorisé). Le degré est
+    doublé, de `min_degree` à `max_degree`, tant que l'écart entre l'interpolant et le
+    pricer aux nouveaux points dépasse `tolerance` x max |prix| ; les coefficients de
+    queue négligeables sont ensuite tronqués. `error` est l'erreur maximale estimée
+    (écart aux derniers points ajoutés + coefficients tronqués) et `accepted` indique
+    si elle respecte la tolérance (sinon, par exemple pour un payoff à l'échéance,
+    le pricer enveloppé doit être utilisé directement).
+
+    Les scénarios sont valorisés par l'algorithme de Clenshaw (coût O(degré) par spot) ;
+    les spots hors de [lower, upper] sont valorisés par le pricer enveloppé, un à la fois.
+
+    Paramètres :
+    ------------
+    - pricer : Pricer -> Pricer exact (date cible et transaction)
+    - lower, upper : float -> Bornes de la grille de spots
+    - tolerance : float -> Erreur relative maximale (au plus grand |prix| de la grille)
+    - min_degree, max_degree : int -> Degrés initial et maximal (puissances de 2)
+    """
+
+    def __init__(self, pricer: Pricer, lower: float, upper: float, tolerance: float = 1e-6,
+                 min_degree: int = 8, max_degree: int = 256):
+        self.pricer = pricer
+        self.calculation_date = pricer.calculation_date
+        self.instrument = pricer.instrument
+        self.lower, self.upper = float(lower), float(upper)
+        self.tolerance = tolerance
+
+        degree = min_degree
+        values = self._sample(lobatto_nodes(degree))
+        while True:
+            refined = np.empty(2 * degree + 1)
+            refined[::2] = values
+            refined[1::2] = self._sample(lobatto_nodes(2 * degree)[1::2])
+            coefficients = chebyshev_coefficients(values)
+            scale = max(np.max(np.abs(refined)), np.finfo(float).tiny)
+            error = np.max(np.abs(clenshaw(lobatto_nodes(2 * degree)[1::2], coefficients) - refined[1::2]))
+            degree, values = 2 * degree, refined
+            if error <= tolerance * scale or degree >= max_degree:
+                break
+
+        # Interpolant au degré le plus fin ; troncature des coefficients dont la somme reste sous la tolérance
+        coefficients = chebyshev_coefficients(values)
+        tail = np.cumsum(np.abs(coefficients[::-1]))[::-1]
+        keep = np.flatnonzero(tail > 0.5 * tolerance * scale)
+        self.coefficients = coefficients[:keep[-1] + 1] if len(keep) else coefficients[:1]
+        truncated = tail[len(self.coefficients)] if len(self.coefficients) < len(coefficients) else 0.0
+        self.degree = len(self.coefficients) - 1
+        self.error = float(error + truncated)
+        self.accepted = self.error <= tolerance * scale
+
+    @classmethod
+    def around_spot(cls, pricer: Pricer, spot: float, daily_volatility: float, horizon: int,
+                    **kwargs) -> "InterpolatedPricer":
+        """
+        Grille S_0 exp(±GRID_SHOCKS sigma sqrt(h)) couvrant les scénarios simulés à l'horizon.
+        """
+        width = GRID_SHOCKS * daily_volatility * np.sqrt(max(horizon, 1))
+        return cls(pricer, spot * np.exp(-width), spot * np.exp(width), **kwargs)
+
+    def _exact(self, spots: np.ndarray) -> np.ndarray:
+        return np.array([float(self.pricer.calculate_batch(spot)) for spot in spots])
+
+    def _sample(self, nodes: np.ndarray) -> np.ndarray:
+        return self._exact(0.5 * (self.upper + self.lower) + 0.5 * (self.upper - self.lower) * nodes)
+
+    def calculate_batch(self, spots):
+        S = np.asarray(spots, dtype=float)
+        x = (2 * S - (self.upper + self.lower)) / (self.upper - self.lower)
+        prices = clenshaw(x, self.coefficients)
+        outside = np.abs(x) > 1
+        if np.any(outside):
+            prices = np.where(outside, 0.0, prices)
+            prices[outside] = self._exact(S[outside])
+        return prices
+
+    def greeks_batch(self, spots) -> dict:
+        return self.pricer.greeks_batch(spots)
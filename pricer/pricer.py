@@ -8,38 +8,149 @@ Created on Sun Mar 17 11:35:36 2024
 import abc
 import numpy as np
 import pandas as pd
-from scipy.stats import norm
+from scipy.special import ndtr
 
 from Deal.deal import Call, Put, Future
 
 CONVENTION_YEAR_FRACTION = 365
 
+
+def _d1_d2(S, K, r, sigma, T):
+    """
+    Termes d1 / d2 de Black-Scholes, diffusés (broadcast) sur les spots et les paramètres.
+    Pour T <= 0 les valeurs sont sans objet (le payoff est retenu par l'appelant).
+    """
+    vol_sqrt_T = sigma * np.sqrt(np.maximum(T, 0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # log(S) - log(K) : un logarithme par spot et par strike, et non par couple diffusé
+        d1 = (np.log(S) - np.log(K) + (r + 0.5 * sigma ** 2) * T) / vol_sqrt_T
+    return d1, d1 - vol_sqrt_T
+
+
+def _density(d):
+    """
+    Densité de la loi normale centrée réduite.
+    """
+    return np.exp(-0.5 * d ** 2) / np.sqrt(2 * np.pi)
+
+
+def call_price(S, K, r, sigma, T):
+    """
+    Prix Black-Scholes d'un call ; payoff max(S - K, 0) si T <= 0.
+    Les arguments sont des scalaires ou des tableaux compatibles par broadcast
+    (ex. spots (1, n) x paramètres de transactions (m, 1) -> prix (m, n)).
+    """
+    d1, d2 = _d1_d2(S, K, r, sigma, T)
+    price = S * ndtr(d1) - K * np.exp(-r * T) * ndtr(d2)
+    return np.where(T > 0, price, np.maximum(S - K, 0))
+
+
+def put_price(S, K, r, sigma, T):
+    """
+    Prix Black-Scholes d'un put ; payoff max(K - S, 0) si T <= 0.
+    """
+    d1, d2 = _d1_d2(S, K, r, sigma, T)
+    price = K * np.exp(-r * T) * ndtr(-d2) - S * ndtr(-d1)
+    return np.where(T > 0, price, np.maximum(K - S, 0))
+
+
+def future_price(S, K, r, sigma, T):
+    """
+    Prix forward S * exp(r * T) ; S si T <= 0. K et sigma sont ignorés (signature commune).
+    """
+    return S * np.exp(r * np.maximum(T, 0))
+
+
+def call_greeks(S, K, r, sigma, T):
+    """
+    Sensibilités analytiques d'un call (delta, gamma, vega), diffusées comme call_price.
+    Si T <= 0 : delta du payoff (1 si S > K), gamma et vega nuls.
+    """
+    d1, _ = _d1_d2(S, K, r, sigma, T)
+    sqrt_T = np.sqrt(np.maximum(T, 0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gamma = _density(d1) / (S * sigma * sqrt_T)
+    alive = T > 0
+    return (np.where(alive, ndtr(d1), (S > K).astype(float)),
+            np.where(alive, gamma, 0.0),
+            np.where(alive, S * _density(d1) * sqrt_T, 0.0))
+
+
+def put_greeks(S, K, r, sigma, T):
+    """
+    Sensibilités analytiques d'un put : delta = N(d1) - 1, gamma et vega identiques au call.
+    """
+    delta, gamma, vega = call_greeks(S, K, r, sigma, T)
+    return np.where(T > 0, delta - 1.0, -(S < K).astype(float)), gamma, vega
+
+
+def future_greeks(S, K, r, sigma, T):
+    """
+    Sensibilités du prix forward : delta = exp(r * T), gamma et vega nuls.
+    """
+    delta = np.exp(r * np.maximum(T, 0)) * np.ones_like(np.asarray(S, dtype=float))
+    return delta, np.zeros_like(delta), np.zeros_like(delta)
+
+
 class Pricer(abc.ABC):
-    @abc.abstractmethod
     def calculate(self, risk_factor):
+        """
+        Valorisation à partir des données de marché (dict ou MarketScenario).
+        Si le spot lu est un tableau de scénarios, retourne un tableau de prix.
+        """
+        S = risk_factor[self.instrument.underlying].get_by_date(self.calculation_date.strftime('%m/%d/%Y'))
+        price = self.calculate_batch(S)
+        return price if np.ndim(price) else float(price)
+
+    @abc.abstractmethod
+    def calculate_batch(self, spots):
+        """
+        Valorisation vectorisée sur un tableau de spots du sous-jacent.
+        Retourne un np.ndarray de prix de même forme que `spots`.
+        """
         pass
 
-    
+    def greeks(self, risk_factor) -> dict:
+        """
+        Sensibilités analytiques au spot lu dans les données de marché (voir greeks_batch).
+        """
+        S = risk_factor[self.instrument.underlying].get_by_date(self.calculation_date.strftime('%m/%d/%Y'))
+        return {name: value if np.ndim(value) else float(value) for name, value in self.greeks_batch(S).items()}
+
+    @abc.abstractmethod
+    def greeks_batch(self, spots) -> dict:
+        """
+        Delta, gamma et vega vectorisés sur un tableau de spots du sous-jacent :
+        {"delta": ..., "gamma": ..., "vega": ...}, chaque tableau de même forme que `spots`.
+        """
+        pass
+
+    def path_statistics(self) -> tuple:
+        """
+        Statistiques de trajectoire nécessaires à la valorisation (PathStatistic) ; aucune
+        pour un produit dont le prix ne dépend que du spot.
+        """
+        return ()
+
+    def time_to_maturity(self) -> float:
+        return (self.instrument.maturity - self.calculation_date).days / CONVENTION_YEAR_FRACTION
+
+
 class CallPricer(Pricer):
     def __init__(self, calculation_date, instrument: Call):
         self.calculation_date = pd.to_datetime(calculation_date)
         self.instrument = instrument
 
-    def calculate(self, risk_factor):
-        S = risk_factor[self.instrument.underlying].get_by_date(self.calculation_date.strftime('%m/%d/%Y'))
-        K = self.instrument.strike 
-        r = self.instrument.rate_const 
-        sigma = self.instrument.vol_const 
-        T = (self.instrument.maturity - self.calculation_date).days / CONVENTION_YEAR_FRACTION 
-
-        if T <= 0:
-            return max(S - K, 0) 
+    def calculate_batch(self, spots):
+        S = np.asarray(spots, dtype=float)
+        return call_price(S, self.instrument.strike, self.instrument.rate_const, self.instrument.vol_const,
+                          self.time_to_maturity())
 
-        d1 = (np.log(S / K) + (r + 0.5 * sigma ** 2) * T) / (sigma * np.sqrt(T))
-        d2 = d1 - sigma * np.sqrt(T)
-
-        call_price = S * norm.cdf(d1) - K * np.exp(-r * T) * norm.cdf(d2)
-        return call_price
+    def greeks_batch(self, spots) -> dict:
+        S = np.asarray(spots, dtype=float)
+        greeks = call_greeks(S, self.instrument.strike, self.instrument.rate_const, self.instrument.vol_const,
+                             self.time_to_maturity())
+        return dict(zip(("delta", "gamma", "vega"), greeks))
 
 
 class PutPricer(Pricer):
@@ -47,21 +158,16 @@ class PutPricer(Pricer):
         self.calculation_date = pd.to_datetime(calculation_date)
         self.instrument = instrument
 
-    def calculate(self, risk_factor):
-        S = risk_factor[self.instrument.underlying].get_by_date(self.calculation_date.strftime('%m/%d/%Y'))
-        K = self.instrument.strike
-        r = self.instrument.rate_const 
-        sigma = self.instrument.vol_const 
-        T = (self.instrument.maturity - self.calculation_date).days / CONVENTION_YEAR_FRACTION
+    def calculate_batch(self, spots):
+        S = np.asarray(spots, dtype=float)
+        return put_price(S, self.instrument.strike, self.instrument.rate_const, self.instrument.vol_const,
+                         self.time_to_maturity())
 
-        if T <= 0:
-            return max(K - S, 0) 
-
-        d1 = (np.log(S / K) + (r + 0.5 * sigma ** 2) * T) / (sigma * np.sqrt(T))
-        d2 = d1 - sigma * np.sqrt(T)
-
-        put_price = K * np.exp(-r * T) * norm.cdf(-d2) - S * norm.cdf(-d1)
-        return put_price
+    def greeks_batch(self, spots) -> dict:
+        S = np.asarray(spots, dtype=float)
+        greeks = put_greeks(S, self.instrument.strike, self.instrument.rate_const, self.instrument.vol_const,
+                            self.time_to_maturity())
+        return dict(zip(("delta", "gamma", "vega"), greeks))
 
 
 class FuturePricer(Pricer):
@@ -69,15 +175,11 @@ class FuturePricer(Pricer):
         self.calculation_date = pd.to_datetime(calculation_date)
         self.instrument = instrument
 
-    def calculate(self, risk_factor):
-        S = risk_factor[self.instrument.underlying].get_by_date(self.calculation_date.strftime('%m/%d/%Y'))
-        r = self.instrument.rate_const
-        T = (self.instrument.maturity - self.calculation_date).days / CONVENTION_YEAR_FRACTION 
-
-        if T <= 0:
-            return S 
-
-        future_price = S * np.exp(r * T)
-        return future_price
+    def calculate_batch(self, spots):
+        S = np.asarray(spots, dtype=float)
+        return future_price(S, None, self.instrument.rate_const, None, self.time_to_maturity())
 
-    
+    def greeks_batch(self, spots) -> dict:
+        S = np.asarray(spots, dtype=float)
+        greeks = future_greeks(S, None, self.instrument.rate_const, None, self.time_to_maturity())
+        return dict(zip(("delta", "gamma", "vega"), greeks))
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: babacardiallo
+"""
+import numpy as np
+
+# Ordres d'approximation disponibles : PnL linéaire ou quadratique en la variation du spot
+APPROXIMATION_ORDERS = {"delta": 1, "delta_gamma": 2}
+
+# Chocs de contrôle du sous-jacent, en écarts-types de son rendement log à l'horizon
+PROBE_SHOCKS = np.array([-4.0, -3.0, -2.0, -1.0, 1.0, 2.0, 3.0, 4.0])
+
+
+class SensitivityApproximation:
+    """
+    Approximation du PnL d'une transaction à un horizon par ses sensibilités :
+
+        PnL(S) ≈ [P_h(S_0) - P_0(S_0)] + delta_h (S - S_0) + 1/2 gamma_h (S - S_0)²
+
+    P_0 est le prix d'aujourd'hui et P_h le prix à la date cible ; le premier terme est
+    l'écoulement du temps à spot inchangé (theta sur l'horizon, calculé exactement),
+    delta_h et gamma_h sont les sensibilités analytiques à la date cible au spot S_0.
+    La volatilité des transactions étant constante, le vega n'intervient pas dans le PnL.
+
+    L'approximation n'est retenue que si elle reproduit la revalorisation complète aux
+    chocs de contrôle S_0 exp(k sigma sqrt(h)), k dans PROBE_SHOCKS (sigma : écart-type
+    historique du rendement journalier), à `tolerance` près relativement au plus grand
+    |PnL| de contrôle. Les options échues à la date cible (payoff non dérivable) sont
+    toujours revalorisées complètement.
+
+    Paramètres :
+    ------------
+    - pricer : Pricer -> Pricer de la transaction à la date cible
+    - theoretical_price : float -> Prix d'aujourd'hui P_0(S_0)
+    - spot : float -> Spot du sous-jacent aujourd'hui S_0
+    - daily_volatility : float -> Écart-type du rendement log journalier du sous-jacent
+    - horizon : int -> Horizon en jours
+    - order : str -> 'delta' ou 'delta_gamma'
+    - tolerance : float -> Erreur relative maximale aux chocs de contrôle
+    """
+
+    def __init__(self, pricer, theoretical_price: float, spot: float, daily_volatility: float, horizon: int,
+                 order: str = "delta_gamma", tolerance: float = 0.05):
+        if order not in APPROXIMATION_ORDERS:
+            raise ValueError(f"Ordre d'approximation inconnu : {order}")
+        self.spot = float(spot)
+        self.carry = float(pricer.calculate_batch(self.spot)) - theoretical_price
+        greeks = pricer.greeks_batch(self.spot)
+        self.delta = float(greeks["delta"])
+        self.gamma = float(greeks["gamma"]) if APPROXIMATION_ORDERS[order] > 1 else 0.0
+
+        probes = self.spot * np.exp(PROBE_SHOCKS * daily_volatility * np.sqrt(max(horizon, 1)))
+        full = pricer.calculate_batch(probes) - theoretical_price
+        scale = np.max(np.abs(full))
+        self.error = float(np.max(np.abs(self.pnl(probes) - full)))
+        self.relative_error = self.error / scale if scale > 0 else 0.0
+        self.accepted = pricer.time_to_maturity() > 0 and self.relative_error <= tolerance
+
+    def pnl(self, spots) -> np.ndarray:
+        """
+        PnL approché pour un tableau de spots simulés du sous-jacent.
+        """
+        move = np.asarray(spots, dtype=float) - self.spot
+        return self.carry + move * (self.delta + 0.5 * self.gamma * move)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: babacardiallo
+"""
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from MarketData.marketdata import MarketScenario
+
+
+@dataclass
+class ScenarioSet:
+    """
+    Jeu de scénarios de marché simulé une seule fois pour une date de calcul
+    et un horizon donnés, puis partagé par toutes les transactions du book.
+
+    Attributs :
+    -----------
+    - date : pd.Timestamp -> Date de calcul (spot)
+    - horizon : int -> Horizon de simulation en jours
+    - spots : dict -> {actif: np.ndarray des prix simulés à l'horizon}
+    - path_statistics : dict -> {PathStatistic: np.ndarray} statistiques courantes des
+      trajectoires simulées entre la date de calcul et l'horizon (produits path-dependent)
+    """
+    date: pd.Timestamp
+    horizon: int
+    spots: dict
+    path_statistics: dict = field(default_factory=dict)
+
+    @property
+    def target_date(self) -> pd.Timestamp:
+        return pd.Timestamp(self.date) + pd.Timedelta(days=self.horizon)
+
+    @property
+    def number_samples(self) -> int:
+        return len(next(iter(self.spots.values()))) if self.spots else 0
+
+    def market_state(self, market_data: dict) -> MarketScenario:
+        """
+        Vue des données de marché à la date cible, les spots simulés
+        remplaçant les spots historiques (sans copie de l'historique).
+        """
+        return MarketScenario(market_data, self.target_date, self.spots, self.path_statistics, self.date)
+
+    def __getitem__(self, asset: str) -> np.ndarray:
+        return self.spots[asset]
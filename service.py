@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: babacardiallo
+"""
+import asyncio
+import json
+import socket
+import time
+from dataclasses import dataclass, fields, replace
+
+import numpy as np
+import pandas as pd
+
+import launcher
+from Deal.dealbook import DEAL_TYPES
+from MarketData.universe import MarketDataUniverse
+from mc_diffusion import as_horizons
+from portfolio import PortfolioPnL, position_weight
+from pricer.engine import required_statistics, revalue
+from scenario import ScenarioSet
+
+# Adresse d'écoute du service (boucle locale uniquement)
+HOST = "127.0.0.1"
+PORT = 8765
+
+
+def deal_from_dict(payload: dict):
+    """
+    Construit une transaction à partir de sa description JSON, ex.
+    {"type": "Call", "deal_id": "X", "position": "Long", "notional": 100, "currency": "EUR",
+     "underlying": "CAC40", "rate_const": 0.03, "vol_const": 0.2, "strike": 8000,
+     "start_date": "2024-03-15", "maturity": "2024-12-20"}
+    """
+    deal_class = DEAL_TYPES.get(payload.get("type"))
+    if deal_class is None:
+        raise ValueError(f"Unknown deal type: {payload.get('type')}")
+    values = {}
+    for field in fields(deal_class):
+        if field.name not in payload:
+            raise ValueError(f"Champ manquant pour {payload['type']} : {field.name}")
+        value = payload[field.name]
+        if field.name in ("start_date", "maturity"):
+            value = pd.to_datetime(value).to_pydatetime()
+        elif field.type is float:
+            value = float(value)
+        values[field.name] = value
+    return deal_class(**values)
+
+
+@dataclass
+class ServiceState:
+    """
+    Etat chaud du service. Un état publié n'est jamais modifié : chaque modification
+    (rechargement, ajout ou retrait de transactions, scénarios supplémentaires) construit
+    un nouvel état, publié d'un bloc ; une lecture travaille sur l'état lu à son début.
+
+    Attributs :
+    -----------
+    - deals : dict -> {deal_id: Deal} du book
+    - universe : MarketDataUniverse -> Données de marché alignées
+    - scenarios : dict -> {horizon simulé: ScenarioSet} (horizons demandés et horizons
+      ramenés à la maturité des transactions), avec les statistiques de trajectoire
+      des produits path-dependent
+    - portfolios : dict -> {horizon demandé: PortfolioPnL} du book
+    - totals : dict -> {horizon demandé: PnL du portefeuille par scénario}
+    """
+    deals: dict
+    universe: MarketDataUniverse
+    scenarios: dict
+    portfolios: dict
+    totals: dict
+
+
+class VaRService:
+    """
+    Service local de VaR : calibration, scénarios et matrices de PnL du book sont
+    calculés une fois (`warm_up`) puis gardés en mémoire. Une requête what-if ne
+    valorise que les transactions proposées sur les scénarios en cache, à partir des
+    mêmes tirages que VaRMCEvaluator (mêmes blocs, mêmes graines) : le coût est celui
+    d'une revalorisation et d'un percentile, sans relecture des fichiers ni simulation.
+
+    Protocole : une requête JSON par ligne, une réponse JSON par ligne (voir `handle`).
+    Les transactions ajoutées par `add_deals` ne vivent qu'en mémoire : `reload`
+    reconstruit l'état à partir des fichiers.
+
+    Paramètres :
+    ------------
+    - evaluator : VaRMCEvaluator -> Paramètres de calcul (date, seuil, diffusion, pricers)
+    - load_deals : callable -> Retourne le book {deal_id: Deal}
+    - load_market_data : callable -> Retourne les données de marché {nom: série}
+    - T_days : int | list -> Horizon(s) de la VaR
+    """
+
+    def __init__(self, evaluator, load_deals, load_market_data, T_days):
+        self.evaluator = evaluator
+        self.load_deals = load_deals
+        self.load_market_data = load_market_data
+        self.horizons = as_horizons(T_days)
+        self.calculation_date = pd.to_datetime(evaluator.calculation_date)
+        self.state = None
+        self._lock = None
+
+    def horizon(self, deal, requested: int) -> int:
+        """
+        Horizon retenu pour une transaction : borné à [0, jours jusqu'à la maturité],
+        comme dans VaRMCEvaluator.evaluate.
+        """
+        return min(max(requested, 0), (deal.maturity - self.calculation_date).days)
+
+    def warm_up(self) -> ServiceState:
+        """
+        Lecture du book et des données de marché, calibration, simulation de tous les
+        blocs de scénarios et revalorisation du book ; l'état précédent n'est remplacé
+        qu'une fois le nouveau complet.
+        """
+        deals = self.load_deals()
+        universe = MarketDataUniverse.of(self.load_market_data())
+        horizons = as_horizons(list(self.horizons) + [self.horizon(deal, requested) for deal in deals.values()
+                                                      for requested in self.horizons])
+        state = ServiceState(deals, universe, self._simulate(universe, horizons, required_statistics(deals)), {}, {})
+
+        pnl = self._revalue(state, deals, state.scenarios)
+        deal_ids = list(deals)
+        for requested in self.horizons:
+            matrix = np.empty((self.evaluator.number_sample, len(deal_ids)))
+            for column, deal_id in enumerate(deal_ids):
+                deal = deals[deal_id]
+                matrix[:, column] = position_weight(deal) * pnl[(deal_id, self.horizon(deal, requested))]
+            state.portfolios[requested] = PortfolioPnL(matrix, deal_ids, deals, self.evaluator.threshold)
+            state.totals[requested] = state.portfolios[requested].total
+        self.state = state
+        return state
+
+    def _simulate(self, universe: MarketDataUniverse, horizons: tuple, path_statistics: tuple = ()) -> dict:
+        """
+        Scénarios complets par horizon, bloc par bloc comme MCDiffusion.iter_scenarios.
+        Les tirages ne dépendent que de la graine, du bloc et de l'horizon le plus long :
+        simuler un horizon supplémentaire plus court, ou une statistique de trajectoire
+        supplémentaire, ne modifie pas les autres.
+        """
+        diffusion = self.evaluator.mc_diffusion
+        chunks = list(diffusion.iter_scenarios(universe, horizons, path_statistics))
+        return {horizon: ScenarioSet(
+                    date=self.calculation_date, horizon=horizon,
+                    spots={asset: np.concatenate([chunk[horizon][asset] for chunk in chunks])
+                           for asset in chunks[0][horizon].spots},
+                    path_statistics={statistic: np.concatenate([chunk[horizon].path_statistics[statistic]
+                                                                for chunk in chunks])
+                                     for statistic in path_statistics})
+                for horizon in horizons}
+
+    def _missing_scenarios(self, state: ServiceState, deals: dict):
+        """
+        Horizons et statistiques de trajectoire requis par `deals` absents des scénarios de `state`.
+        """
+        horizons = {self.horizon(deal, requested) for deal in deals.values() for requested in self.horizons}
+        known = next(iter(state.scenarios.values())).path_statistics
+        return (horizons - set(state.scenarios),
+                [statistic for statistic in required_statistics(deals) if statistic not in known])
+
+    def _scenarios_for(self, state: ServiceState, deals: dict) -> dict:
+        """
+        Scénarios couvrant `deals` : ceux de `state` s'ils suffisent, sinon un nouveau
+        dictionnaire complété par simulation (mêmes tirages), `state` restant inchangé.
+        """
+        missing, missing_statistics = self._missing_scenarios(state, deals)
+        known = tuple(next(iter(state.scenarios.values())).path_statistics)
+        if missing_statistics:
+            # Nouvelle statistique de trajectoire : tous les horizons sont re-simulés
+            return self._simulate(state.universe, as_horizons(list(state.scenarios) + list(missing)),
+                                  known + tuple(missing_statistics))
+        if missing:
+            # Horizons ramenés à la maturité, tous inférieurs à l'horizon le plus long déjà simulé
+            return {**state.scenarios, **self._simulate(state.universe, as_horizons(list(state.scenarios)
+                                                                                    + list(missing)), known)}
+        return state.scenarios
+
+    def needs_simulation(self, deals: list) -> bool:
+        """
+        Vrai si la valorisation des transactions `deals` (descriptions JSON) demande de simuler
+        des horizons ou des statistiques de trajectoire absents de l'état courant.
+        """
+        missing, missing_statistics = self._missing_scenarios(
+            self.state, {deal.deal_id: deal for deal in map(deal_from_dict, deals)})
+        return bool(missing or missing_statistics)
+
+    def _revalue(self, state: ServiceState, deals: dict, scenarios: dict) -> dict:
+        """
+        PnL non pondéré de chaque transaction sur les scénarios `scenarios` (voir _scenarios_for) :
+        {(deal_id, horizon retenu): np.ndarray (n_scénarios,)}. Les types disposant
+        d'un noyau vectorisé sont valorisés par BookPricer, groupés par horizon (voir revalue).
+        """
+        by_horizon = {}
+        for deal_id, deal in deals.items():
+            for requested in self.horizons:
+                by_horizon.setdefault(self.horizon(deal, requested), {})[deal_id] = deal
+
+        pnl = {}
+        for horizon, group in by_horizon.items():
+            market_state = scenarios[horizon].market_state(state.universe)
+            target_date = self.calculation_date + pd.Timedelta(days=horizon)
+            revalued = revalue(group, self.calculation_date, target_date, state.universe, market_state)
+            pnl.update({(deal_id, horizon): deal_pnl for deal_id, deal_pnl in revalued.items()})
+        return pnl
+
+    def _weighted_pnl(self, state: ServiceState, deals: dict, scenarios: dict) -> dict:
+        """
+        {horizon demandé: matrice (n_scénarios, len(deals)) du PnL pondéré}.
+        """
+        pnl = self._revalue(state, deals, scenarios)
+        return {requested: np.column_stack([position_weight(deal) * pnl[(deal_id, self.horizon(deal, requested))]
+                                            for deal_id, deal in deals.items()])
+                for requested in self.horizons}
+
+    def _quantile(self, pnl: np.ndarray) -> float:
+        return float(np.percentile(pnl, (1 - self.evaluator.threshold) * 100))
+
+    # **Requêtes**
+
+    def summary(self) -> dict:
+        state = self.state  # Instantané : un état publié n'est pas modifié
+        return {"deals": len(state.deals),
+                "samples": self.evaluator.number_sample,
+                "horizons": {str(requested): {"var": portfolio.value_at_risk(), "es": portfolio.expected_shortfall()}
+                             for requested, portfolio in state.portfolios.items()}}
+
+    def what_if(self, deals: list) -> dict:
+        """
+        Effet sur la VaR de l'ajout des transactions `deals` (descriptions JSON),
+        sans modifier le book : VaR avant / après, incrémentale et isolée, ES après.
+        Si des scénarios manquent (needs_simulation), ils sont simulés et publiés avec
+        l'état : l'appelant doit alors détenir le verrou des modifications (voir _respond).
+        """
+        state = self.state
+        new_deals = {deal.deal_id: deal for deal in map(deal_from_dict, deals)}
+        scenarios = self._scenarios_for(state, new_deals)
+        if scenarios is not state.scenarios:
+            self.state = replace(state, scenarios=scenarios)
+        weighted = self._weighted_pnl(state, new_deals, scenarios)
+        result = {}
+        for requested, matrix in weighted.items():
+            added = matrix.sum(axis=1)
+            total = state.totals[requested] + added
+            before, after = self._quantile(state.totals[requested]), self._quantile(total)
+            result[str(requested)] = {"var_before": before, "var_after": after, "incremental_var": after - before,
+                                      "standalone_var": self._quantile(added),
+                                      "es_after": float(total[total <= after].mean())}
+        return result
+
+    def add_deals(self, deals: list) -> dict:
+        state = self.state
+        new_deals = {deal.deal_id: deal for deal in map(deal_from_dict, deals)}
+        duplicates = set(new_deals) & set(state.deals)
+        if duplicates:
+            raise ValueError(f"Transactions déjà présentes : {sorted(duplicates)}")
+        scenarios = self._scenarios_for(state, new_deals)
+        weighted = self._weighted_pnl(state, new_deals, scenarios)
+        book = {**state.deals, **new_deals}
+        portfolios = {requested: PortfolioPnL(np.hstack([state.portfolios[requested].pnl, matrix]),
+                                              state.portfolios[requested].deal_ids + list(new_deals), book,
+                                              self.evaluator.threshold)
+                      for requested, matrix in weighted.items()}
+        self.state = ServiceState(book, state.universe, scenarios, portfolios,
+                                  {requested: portfolio.total for requested, portfolio in portfolios.items()})
+        return self.summary()
+
+    def remove_deals(self, deal_ids: list) -> dict:
+        state = self.state
+        unknown = set(deal_ids) - set(state.deals)
+        if unknown:
+            raise ValueError(f"Transactions inconnues : {sorted(unknown)}")
+        book = {deal_id: deal for deal_id, deal in state.deals.items() if deal_id not in deal_ids}
+        portfolios = {}
+        for requested, portfolio in state.portfolios.items():
+            kept = [column for column, deal_id in enumerate(portfolio.deal_ids) if deal_id not in deal_ids]
+            portfolios[requested] = PortfolioPnL(portfolio.pnl[:, kept], [portfolio.deal_ids[k] for k in kept],
+                                                 book, self.evaluator.threshold)
+        self.state = ServiceState(book, state.universe, state.scenarios, portfolios,
+                                  {requested: portfolio.total for requested, portfolio in portfolios.items()})
+        return self.summary()
+
+    def components(self) -> dict:
+        state = self.state
+        return {str(requested): portfolio.component_var() for requested, portfolio in state.portfolios.items()}
+
+    def handle(self, message: dict) -> dict:
+        """
+        Traite une requête {"action": ..., ...} :
+        - "ping", "shutdown" ; "summary" : VaR / ES du book par horizon ; "components" : VaR en composantes
+        - "what_if" (deals : liste de transactions) : effet de leur ajout, book inchangé
+        - "add_deals" (deals) / "remove_deals" (deal_ids) : modification du book en mémoire
+        - "reload" : relecture des fichiers, recalibration et resimulation
+        """
+        action = message.get("action")
+        if action in ("ping", "shutdown"):
+            return {}
+        if action == "summary":
+            return self.summary()
+        if action == "components":
+            return self.components()
+        if action == "what_if":
+            return self.what_if(message["deals"])
+        if action == "add_deals":
+            return self.add_deals(message["deals"])
+        if action == "remove_deals":
+            return self.remove_deals(message["deal_ids"])
+        if action == "reload":
+            self.warm_up()
+            return self.summary()
+        raise ValueError(f"Action inconnue : {action}")
+
+    # **Serveur asyncio**
+
+    async def _respond(self, message: dict) -> dict:
+        start = time.perf_counter()
+        try:
+            action = message.get("action")
+            if (action in ("add_deals", "remove_deals", "reload")
+                    or (action == "what_if" and self.needs_simulation(message["deals"]))):
+                # Modifications et simulations sérialisées, hors de la boucle d'événements ; les
+                # lectures continuent sur l'état publié jusqu'au remplacement de celui-ci
+                async with self._lock:
+                    result = await asyncio.get_running_loop().run_in_executor(None, self.handle, message)
+            else:
+                result = self.handle(message)
+            response = {"status": "ok", "result": result}
+        except Exception as exc:
+            response = {"status": "error", "message": f"{type(exc).__name__}: {exc}"}
+        response["elapsed_ms"] = (time.perf_counter() - start) * 1000
+        return response
+
+    async def _client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while line := await reader.readline():
+                try:
+                    message = json.loads(line)
+                except json.JSONDecodeError as exc:
+                    message, response = None, {"status": "error", "message": f"JSON invalide : {exc}"}
+                if message is not None:
+                    response = await self._respond(message)
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+                if message is not None and message.get("action") == "shutdown":
+                    self._server.close()
+                    break
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = HOST, port: int = PORT):
+        """
+        Démarre le service : préchauffage puis écoute jusqu'à une requête "shutdown".
+        """
+        self._lock = asyncio.Lock()
+        if self.state is None:
+            await asyncio.get_running_loop().run_in_executor(None, self.warm_up)
+        self._server = await asyncio.start_server(self._client, host, port)
+        print(f"Service VaR à l'écoute sur {host}:{port} ({len(self.state.deals)} transactions, "
+              f"{self.evaluator.number_sample} scénarios)")
+        async with self._server:
+            try:
+                await self._server.serve_forever()
+            except asyncio.CancelledError:
+                pass
+
+
+def request(message: dict, host: str = HOST, port: int = PORT, timeout: float = None) -> dict:
+    """
+    Client synchrone : envoie une requête au service et retourne la réponse décodée.
+    """
+    with socket.create_connection((host, port), timeout=timeout) as connection:
+        connection.sendall(json.dumps(message).encode() + b"\n")
+        with connection.makefile("rb") as stream:
+            return json.loads(stream.readline())
+
+
+def main():
+    service = VaRService(launcher.build_evaluator(), launcher.load_deals, launcher.load_market_data,
+                         launcher.T_days)
+    asyncio.run(service.serve())
+
+
+if __name__ == "__main__":
+    main()
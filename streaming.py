@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: babacardiallo
+"""
+import math
+
+import numpy as np
+from scipy.stats import norm
+
+
+class StreamingPnL:
+    """
+    Agrégation du PnL d'une transaction bloc par bloc de scénarios.
+
+    Le quantile de queue est exact : le nombre total de scénarios `n` étant connu,
+    le percentile q (interpolation linéaire, identique à np.percentile) ne dépend
+    que des plus petites valeurs. Seul un tampon de queue de taille
+    ceil(q * (n - 1) + z * sqrt(n * q * (1 - q))) + 2 est conservé entre les blocs,
+    soit une mémoire O(chunk + n * q) au lieu de O(n). La marge z * sqrt(...) sert
+    à l'erreur type du quantile (intervalle binomial sur les statistiques d'ordre).
+
+    La moyenne est obtenue par sommes courantes. Si une variable de contrôle
+    d'espérance connue est fournie (ex. spot simulé du sous-jacent, d'espérance égale
+    au forward), la moyenne est corrigée par régression (control variate).
+
+    Paramètres :
+    ------------
+    - number_samples : int -> Nombre total de scénarios attendus
+    - quantile : float -> Quantile recherché dans [0, 1] (ex. 0.01 pour la VaR 99%)
+    - confidence : float -> Niveau de l'intervalle utilisé pour l'erreur type du quantile
+    """
+
+    def __init__(self, number_samples: int, quantile: float, confidence: float = 0.95):
+        self.number_samples = number_samples
+        self.quantile = quantile
+        self.position = (number_samples - 1) * quantile
+        self.z = norm.ppf(0.5 + confidence / 2)
+        self.spread = self.z * math.sqrt(number_samples * quantile * (1 - quantile))
+        self.tail_size = min(math.ceil(self.position + self.spread) + 2, number_samples)
+        self.tail = np.empty(0)
+        self.count = 0
+        self.sums = np.zeros(5)  # [pnl, pnl², contrôle, contrôle², pnl x contrôle]
+
+    def update(self, pnl: np.ndarray, control: np.ndarray = None):
+        """
+        Intègre un bloc de PnL (et éventuellement de la variable de contrôle associée) :
+        met à jour les sommes courantes et le tampon des plus petites valeurs.
+        """
+        pnl = np.asarray(pnl, dtype=float)
+        self.count += len(pnl)
+        self.sums[0] += pnl.sum()
+        self.sums[1] += pnl @ pnl
+        if control is not None:
+            control = np.asarray(control, dtype=float)
+            self.sums[2:] += [control.sum(), control @ control, pnl @ control]
+
+        candidates = np.concatenate([self.tail, pnl])
+        if len(candidates) > self.tail_size:
+            candidates = np.partition(candidates, self.tail_size - 1)[:self.tail_size]
+        self.tail = candidates
+
+    def _moments(self):
+        n = self.count
+        mean_pnl, mean_control = self.sums[0] / n, self.sums[2] / n
+        var_pnl = self.sums[1] / n - mean_pnl ** 2
+        var_control = self.sums[3] / n - mean_control ** 2
+        covariance = self.sums[4] / n - mean_pnl * mean_control
+        return mean_pnl, mean_control, var_pnl, var_control, covariance
+
+    def mean(self, control_mean: float = None) -> float:
+        """
+        Moyenne du PnL ; corrigée par la variable de contrôle si `control_mean`
+        (son espérance exacte) est fourni.
+        """
+        mean_pnl, mean_control, _, var_control, covariance = self._moments()
+        if control_mean is None or var_control <= 0:
+            return mean_pnl
+        beta = covariance / var_control
+        return mean_pnl - beta * (mean_control - control_mean)
+
+    def mean_standard_error(self, control_mean: float = None) -> float:
+        """
+        Erreur type de la moyenne (variance résiduelle de la régression si control variate).
+        """
+        _, _, var_pnl, var_control, covariance = self._moments()
+        if control_mean is not None and var_control > 0:
+            var_pnl -= covariance ** 2 / var_control
+        return math.sqrt(max(var_pnl, 0.0) / self.count)
+
+    def value_at_risk(self) -> float:
+        """
+        Quantile exact du PnL sur l'ensemble des scénarios agrégés.
+        """
+        tail = self._sorted_tail()
+        lower = math.floor(self.position)
+        upper = min(lower + 1, len(tail) - 1)
+        weight = self.position - lower
+        return tail[lower] + weight * (tail[upper] - tail[lower])
+
+    def var_standard_error(self) -> float:
+        """
+        Erreur type du quantile, déduite de l'intervalle de confiance binomial
+        [x_(k - z sqrt(nq(1-q))), x_(k + z sqrt(nq(1-q)))] sur les statistiques d'ordre.
+        Estimation sans hypothèse de loi, valable pour des tirages iid et
+        conservatrice pour les tirages antithétiques ou quasi-aléatoires.
+        """
+        tail = self._sorted_tail()
+        lower = max(math.floor(self.position - self.spread), 0)
+        upper = min(math.ceil(self.position + self.spread), len(tail) - 1)
+        return (tail[upper] - tail[lower]) / (2 * self.z)
+
+    def _sorted_tail(self) -> np.ndarray:
+        if self.count != self.number_samples:
+            raise ValueError(f"{self.count} scénarios agrégés sur {self.number_samples} attendus.")
+        return np.sort(self.tail)